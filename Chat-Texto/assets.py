@@ -0,0 +1,200 @@
+import base64
+import hashlib
+import json
+import mimetypes
+import os
+import threading
+
+# --- CACHE DE ASSETS POR PROCESSO ---
+# O Streamlit reexecuta o main.py a cada interação, mas os módulos importados
+# permanecem em memória. Este cache guarda cada imagem já codificada em base64
+# e é compartilhado por todas as sessões e reruns do mesmo processo.
+# A chave inclui mtime e tamanho do arquivo, então edições são detectadas.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Saída do build_assets.py: imagens no tamanho de exibição + manifesto.
+BUILD_DIR_NAME = "assets_build"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+MANIFEST_PATH = os.path.join(BASE_DIR, BUILD_DIR_NAME, MANIFEST_NAME)
+
+_lock = threading.Lock()
+_cache = {}
+_hashes = {}
+_manifest = {"key": None, "assets": {}}
+_stats = {"hits": 0, "misses": 0, "errors": 0, "optimized": 0, "fallbacks": 0}
+
+
+def resolve_path(path):
+    # Caminhos relativos são resolvidos a partir da pasta do app, para que
+    # `streamlit run Chat-Texto/main.py` funcione a partir de qualquer diretório.
+    if os.path.isabs(path):
+        return path
+    return os.path.join(BASE_DIR, path)
+
+
+def _fingerprint(full_path):
+    stat = os.stat(full_path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _guess_mime(full_path, raw):
+    # A extensão nem sempre confere com o conteúdo (o fundo "jpg" é um AVIF),
+    # então a assinatura do arquivo tem prioridade.
+    if raw.startswith(b"\x89PNG"):
+        return "image/png"
+    if raw.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if raw[:4] == b"RIFF" and raw[8:12] == b"WEBP":
+        return "image/webp"
+    if raw[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    mime, _ = mimetypes.guess_type(full_path)
+    return mime or "application/octet-stream"
+
+
+def _load(full_path):
+    with open(full_path, "rb") as asset_file:
+        raw = asset_file.read()
+    encoded = base64.b64encode(raw).decode()
+    return {
+        "path": full_path,
+        "base64": encoded,
+        "data_uri": f"data:{_guess_mime(full_path, raw)};base64,{encoded}",
+    }
+
+
+def get_asset(path):
+    full_path = resolve_path(path)
+    try:
+        key = _fingerprint(full_path)
+    except OSError:
+        return None
+
+    entry = _cache.get(full_path)
+    if entry is not None and entry[0] == key:
+        with _lock:
+            _stats["hits"] += 1
+        return entry[1]
+
+    with _lock:
+        # Outra thread pode ter carregado o arquivo enquanto esperávamos o lock.
+        entry = _cache.get(full_path)
+        if entry is not None and entry[0] == key:
+            _stats["hits"] += 1
+            return entry[1]
+        try:
+            value = _load(full_path)
+        except Exception as e:
+            _stats["errors"] += 1
+            print(f"Erro ao carregar a imagem '{path}': {e}")
+            return None
+        _cache[full_path] = (key, value)
+        _stats["misses"] += 1
+        return value
+
+
+def get_data_uri(path, fallback_value=None):
+    asset = get_asset(path)
+    return asset["data_uri"] if asset else fallback_value
+
+
+def get_base64(path, fallback_value=""):
+    asset = get_asset(path)
+    return asset["base64"] if asset else fallback_value
+
+
+def file_sha256(full_path):
+    digest = hashlib.sha256()
+    with open(full_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _source_sha256(full_path, key):
+    entry = _hashes.get(full_path)
+    if entry is None or entry[0] != key:
+        entry = (key, file_sha256(full_path))
+        _hashes[full_path] = entry
+    return entry[1]
+
+
+def load_manifest():
+    try:
+        key = _fingerprint(MANIFEST_PATH)
+    except OSError:
+        return {}
+    if _manifest["key"] == key:
+        return _manifest["assets"]
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            print(f"Manifesto de assets '{MANIFEST_PATH}' tem versão incompatível; usando as imagens originais.")
+            loaded = {}
+        else:
+            loaded = data.get("assets", {})
+    except Exception as e:
+        print(f"Erro ao ler o manifesto de assets '{MANIFEST_PATH}': {e}")
+        loaded = {}
+    with _lock:
+        _manifest["key"] = key
+        _manifest["assets"] = loaded
+    return loaded
+
+
+def get_display_asset(path, formats=None):
+    # Usa a menor variante gerada pelo build_assets.py quando o manifesto existe
+    # e corresponde ao arquivo original; caso contrário, usa o original.
+    full_path = resolve_path(path)
+    entry = load_manifest().get(os.path.relpath(full_path, BASE_DIR).replace(os.sep, "/"))
+    if entry:
+        try:
+            fresh = _source_sha256(full_path, _fingerprint(full_path)) == entry.get("source_sha256")
+        except OSError:
+            fresh = False
+        if fresh:
+            variants = entry.get("variants", {})
+            sizes = entry.get("bytes", {})
+            candidates = [fmt for fmt in (formats or variants) if fmt in variants]
+            for fmt in sorted(candidates, key=lambda fmt: sizes.get(fmt, float("inf"))):
+                asset = get_asset(variants[fmt])
+                if asset:
+                    with _lock:
+                        _stats["optimized"] += 1
+                    return asset
+    with _lock:
+        _stats["fallbacks"] += 1
+    return get_asset(path)
+
+
+def get_display_data_uri(path, fallback_value=None, formats=None):
+    asset = get_display_asset(path, formats)
+    return asset["data_uri"] if asset else fallback_value
+
+
+def get_display_path(path, fallback_value=None, formats=None):
+    # Caminho do arquivo em vez do data URI: o Streamlit serve o arquivo por
+    # URL e cada uso na página leva só o endereço, não a imagem inteira.
+    asset = get_display_asset(path, formats)
+    return asset["path"] if asset else fallback_value
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["entries"] = len(_cache)
+        stats["bytes"] = sum(len(value["base64"]) for _, value in _cache.values())
+    return stats
+
+
+def clear_cache():
+    with _lock:
+        _cache.clear()
+        _hashes.clear()
+        _manifest["key"] = None
+        _manifest["assets"] = {}
+        for name in _stats:
+            _stats[name] = 0
@@ -0,0 +1,167 @@
+import json
+import os
+import threading
+import urllib.error
+import urllib.request
+
+import llm_client
+import streaming
+
+# --- BACKENDS DO MODELO ---
+# O app conversa com o modelo por uma interface pequena:
+#   chat = backend.start_chat(history)   # histórico no formato do Gemini
+#   texto = backend.send(chat, prompt)   # resposta completa
+#   for pedaço in backend.stream(chat, prompt): ...
+# Implementações:
+#   * GeminiBackend: a API do Gemini (llm_client.py);
+#   * FakeServerBackend: o servidor local fake_server.py, para testes de carga
+#     e de concorrência sem chave de API nem rede.
+# O backend é escolhido por EMI_BACKEND (gemini ou fake); o endereço do
+# servidor simulado vem de EMI_FAKE_SERVER_URL.
+
+BACKEND_NAME = os.environ.get("EMI_BACKEND", "gemini")
+FAKE_SERVER_URL = os.environ.get("EMI_FAKE_SERVER_URL", "http://127.0.0.1:8765")
+
+
+class BackendError(Exception):
+    def __init__(self, message, code=None):
+        super().__init__(message)
+        self.code = code
+
+
+class QuotaExceeded(BackendError):
+    def __init__(self, message):
+        super().__init__(message, code=429)
+
+
+class GeminiBackend:
+    requires_api_key = True
+
+    def __init__(self, api_key, model_name=None):
+        self.model_name = model_name or llm_client.MODEL_NAME
+        self.model = llm_client.get_model(api_key, self.model_name)
+
+    def start_chat(self, history):
+        return self.model.start_chat(history=history)
+
+    def send(self, chat, prompt):
+        return chat.send_message(prompt, request_options=llm_client.request_options()).text
+
+    def stream(self, chat, prompt):
+        # Falhas temporárias ao abrir o stream (antes do primeiro pedaço) são
+        # repetidas com a política EMI_RETRY_* do llm_client, cada tentativa
+        # num ChatSession novo com o mesmo histórico. Depois do primeiro
+        # pedaço o erro segue para quem consome o stream.
+        history = list(chat.history or [])
+        chats = [chat]
+
+        def open_stream():
+            current = chats.pop() if chats else self.start_chat(history)
+            response = current.send_message(prompt, stream=True, request_options=llm_client.request_options(stream=True))
+            chunks = streaming.iter_response_text(response)
+            return next(chunks, None), chunks
+
+        first, chunks = llm_client.retry_policy()(open_stream)()
+        if first is not None:
+            yield first
+            yield from chunks
+
+
+class FakeChat:
+    __slots__ = ("history",)
+
+    def __init__(self, history):
+        self.history = list(history or [])
+
+
+class FakeServerBackend:
+    # O servidor não guarda estado: cada chamada leva o histórico inteiro.
+    requires_api_key = False
+
+    def __init__(self, url=FAKE_SERVER_URL, timeout=None):
+        self.url = url.rstrip("/")
+        self.timeout = timeout or llm_client.REQUEST_TIMEOUT_S
+        self.model_name = f"fake@{self.url}"
+
+    def _post(self, chat, prompt, stream):
+        body = json.dumps({"history": chat.history, "prompt": prompt, "stream": stream}).encode("utf-8")
+        request = urllib.request.Request(
+            self.url + "/v1/chat", data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        try:
+            return urllib.request.urlopen(request, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read() or b"{}").get("error", str(e))
+            except ValueError:
+                message = str(e)
+            if e.code == 429:
+                raise QuotaExceeded(f"429 {message}") from None
+            raise BackendError(f"{e.code} {message}", code=e.code) from None
+        except OSError as e:
+            raise BackendError(f"Servidor simulado indisponível em {self.url}: {e}") from None
+
+    def _remember(self, chat, prompt, text):
+        chat.history.append({"role": "user", "parts": [prompt]})
+        chat.history.append({"role": "model", "parts": [text]})
+
+    def start_chat(self, history):
+        return FakeChat(history)
+
+    def send(self, chat, prompt):
+        with self._post(chat, prompt, stream=False) as response:
+            text = json.loads(response.read())["text"]
+        self._remember(chat, prompt, text)
+        return text
+
+    def stream(self, chat, prompt):
+        response = self._post(chat, prompt, stream=True)
+        pieces = []
+        with response:
+            for line in response:
+                if not line.strip():
+                    continue
+                item = json.loads(line)
+                if item.get("done"):
+                    self._remember(chat, prompt, "".join(pieces))
+                    return
+                pieces.append(item["text"])
+                yield item["text"]
+        raise BackendError("Stream do servidor simulado terminou sem o sinal de fim.")
+
+
+# --- BACKEND COMPARTILHADO POR PROCESSO ---
+
+_lock = threading.Lock()
+_state = {"key": None, "backend": None}
+
+
+def requires_api_key(name=None):
+    return (name or BACKEND_NAME) == "gemini"
+
+
+def current_model_name(name=None):
+    # Entra na chave do cache de respostas: respostas de backends diferentes
+    # não se misturam.
+    name = name or BACKEND_NAME
+    if name == "fake":
+        return f"fake@{FAKE_SERVER_URL.rstrip('/')}"
+    return llm_client.MODEL_NAME
+
+
+def get_backend(api_key=None, name=None):
+    name = name or BACKEND_NAME
+    key = (name, api_key)
+    if _state["key"] == key:
+        return _state["backend"]
+    with _lock:
+        if _state["key"] != key:
+            if name == "gemini":
+                backend = GeminiBackend(api_key)
+            elif name == "fake":
+                backend = FakeServerBackend()
+            else:
+                raise ValueError(f"Backend desconhecido: {name!r} (use gemini ou fake).")
+            _state["backend"] = backend
+            _state["key"] = key
+    return _state["backend"]
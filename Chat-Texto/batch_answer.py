@@ -0,0 +1,194 @@
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+# Antes dos módulos do app, que leem as configurações EMI_* na importação.
+load_dotenv()
+
+import backends
+import chat_pipeline
+import context
+import faq
+import response_cache
+import scheduler
+
+# --- RESPOSTAS EM LOTE, SEM INTERFACE ---
+# Responde a um arquivo JSONL de perguntas pelo mesmo caminho do app:
+# FAQ, depois cache de respostas, depois contexto e modelo. As perguntas
+# rodam num pool de threads limitado (--workers) e passam por um limite de
+# chamadas ao modelo por minuto (--rate), com a mesma espera exponencial do
+# app em erros de cota. Cada resultado é gravado no JSONL de saída assim que
+# fica pronto; rodar de novo com a mesma saída retoma de onde parou.
+#
+# Entrada: uma pergunta por linha, {"id": "...", "question": "..."} (o id é
+# opcional; sem ele, vale o número da linha).
+#   python batch_answer.py perguntas.jsonl -o respostas.jsonl --workers 4 --rate 60
+
+BATCH_SESSION = "batch"
+PROGRESS_EVERY = 25
+
+
+def read_questions(path):
+    with open(path, encoding="utf-8") as f:
+        for number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                item = {"question": item}
+            yield str(item.get("id", number)), item["question"]
+
+
+def read_done(path, retry_errors):
+    # Ids já respondidos numa execução anterior com a mesma saída.
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                item = json.loads(line)
+            except ValueError:
+                # Linha cortada por uma interrupção no meio da gravação.
+                continue
+            if retry_errors and item.get("source") == "error":
+                continue
+            done.add(str(item["id"]))
+    return done
+
+
+class BatchAnswerer:
+    def __init__(self, backend, admission, refresh=False):
+        self.backend = backend
+        self.admission = admission
+        self.refresh = refresh
+
+    def answer(self, question_id, question):
+        started = time.perf_counter()
+        result = {"id": question_id, "question": question}
+        try:
+            result.update(self._answer(question))
+        except Exception as e:
+            result.update(source="error", answer=None, error=str(e))
+        result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return result
+
+    def _answer(self, question):
+        match = faq.match(question)
+        if match:
+            return {"source": "faq", "answer": match.answer, "faq_tier": match.tier}
+
+        # Cada pergunta do lote é o início de uma conversa.
+        history = context.ConversationContext().build_history([{"role": "user", "content": question}], question)
+        request = chat_pipeline.prepare(question, history)
+        if not self.refresh:
+            cached = response_cache.get(request.cache_key)
+            if cached is not None:
+                return {"source": "cache", "answer": cached, "model": request.model_name}
+
+        with self.admission.admit(BATCH_SESSION):
+            started = time.monotonic()
+            chat = self.backend.start_chat(request.history)
+            text = "".join(self.admission.with_backoff(lambda: self.backend.stream(chat, request.api_prompt)))
+        if not text.strip():
+            # Fica registrada como erro (refeita com --retry-errors) e fora do cache.
+            raise ValueError("o modelo devolveu uma resposta vazia")
+        response_cache.put(request.cache_key, question, request.model_name, text, time.monotonic() - started)
+        return {"source": "model", "answer": text, "model": request.model_name,
+                "sources": [chunk["source"] for chunk in request.chunks]}
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))] if ordered else 0.0
+
+
+def print_stats(results, wall):
+    counts = {}
+    for result in results:
+        counts[result["source"]] = counts.get(result["source"], 0) + 1
+    latencies = [result["latency_ms"] for result in results]
+    summary = ", ".join(f"{count} {source}" for source, count in sorted(counts.items())) or "nenhuma"
+    print(f"\n{len(results)} perguntas respondidas em {wall:.1f} s ({len(results) / wall if wall else 0:.2f}/s): {summary}.")
+    if latencies:
+        print(f"Latência por pergunta: p50 {percentile(latencies, 50):.0f} ms, p95 {percentile(latencies, 95):.0f} ms, "
+              f"p99 {percentile(latencies, 99):.0f} ms, máx {max(latencies):.0f} ms.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Responde em lote a um arquivo JSONL de perguntas.")
+    parser.add_argument("input", help="JSONL com uma pergunta por linha ({\"id\": ..., \"question\": ...}).")
+    parser.add_argument("-o", "--output", help="JSONL de saída (padrão: <entrada>.respostas.jsonl).")
+    parser.add_argument("--workers", type=int, default=4, help="Perguntas em paralelo (padrão: 4).")
+    parser.add_argument("--rate", type=float, default=60.0, help="Chamadas ao modelo por minuto (padrão: 60).")
+    parser.add_argument("--refresh", action="store_true", help="Ignora o cache e consulta o modelo de novo.")
+    parser.add_argument("--retry-errors", action="store_true", help="Refaz as perguntas que falharam antes.")
+    args = parser.parse_args(argv)
+
+    output = args.output or os.path.splitext(args.input)[0] + ".respostas.jsonl"
+    done = read_done(output, args.retry_errors)
+    pending = [(question_id, question) for question_id, question in read_questions(args.input)
+               if question_id not in done]
+    if done:
+        print(f"Retomando: {len(done)} perguntas já respondidas em {output}.")
+    if not pending:
+        print("Nada a fazer.")
+        return 0
+
+    api_key = os.environ.get("GEMINI_API_KEY")
+    if backends.requires_api_key() and not api_key:
+        print("A variável de ambiente GEMINI_API_KEY não foi definida.")
+        return 1
+    admission = scheduler.Scheduler(max_concurrency=args.workers, rate_per_min=args.rate,
+                                    burst=args.workers, queue_max=args.workers * 2)
+    answerer = BatchAnswerer(backends.get_backend(api_key), admission, refresh=args.refresh)
+
+    results = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    # O arquivo é aberto em modo de acréscimo e cada linha é gravada inteira,
+    # então uma interrupção perde no máximo as perguntas em andamento.
+    with open(output, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        def record(future):
+            if future.cancelled():
+                return
+            result = future.result()
+            with lock:
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                results.append(result)
+                finished = len(results)
+            if finished % PROGRESS_EVERY == 0:
+                print(f"{finished}/{len(pending)} perguntas...", flush=True)
+
+        in_flight = set()
+        try:
+            for question_id, question in pending:
+                # Mantém poucas perguntas à frente dos workers, em vez de criar
+                # todas as tarefas de uma vez.
+                if len(in_flight) >= args.workers * 2:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                future = pool.submit(answerer.answer, question_id, question)
+                future.add_done_callback(record)
+                in_flight.add(future)
+            wait(in_flight)
+        except KeyboardInterrupt:
+            print("\nInterrompido; as respostas já gravadas serão reaproveitadas na próxima execução.")
+            for future in in_flight:
+                future.cancel()
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    print_stats(results, time.perf_counter() - started)
+    print(f"Resultados em {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
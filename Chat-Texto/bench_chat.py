@@ -0,0 +1,372 @@
+import argparse
+import functools
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+# --- BENCHMARK DO CAMINHO DE UMA PERGUNTA ---
+# Executa o main.py sem navegador (AppTest do Streamlit) contra o servidor
+# simulado (fake_server.py) e mede, por cenário, latência p50/p95/p99,
+# vazão e pico de memória (RSS). Também mede onde o tempo de cada
+# interação é gasto: recursos visuais, FAQ, histórico (montagem e
+# desenho), recuperação de trechos, cache e modelo.
+#
+# Os resultados são gravados em JSON (bench_results/) para comparar commits:
+#   python bench_chat.py
+#   python bench_chat.py --scenario short_chat --scenario concurrent --sessions 16
+#   python bench_chat.py --compare bench_results/anterior.json
+#
+# O pico de RSS do processo só cresce; para medir um cenário isolado, rode-o
+# sozinho com --scenario. O cenário process_start sobe um processo novo por
+# repetição (imports, primeira página e primeiro clique numa FAQ):
+#   python bench_chat.py --scenario process_start --iterations 5
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MAIN_PATH = os.path.join(BASE_DIR, "main.py")
+RESULTS_DIR = os.path.join(BASE_DIR, "bench_results")
+
+SCENARIOS = ("process_start", "cold_start", "faq_click", "short_chat", "long_chat", "concurrent")
+TOPICS = ("conflito de interesses", "proteção de dados pessoais", "canal de denúncias", "brindes e presentes",
+          "uso de senhas", "tratamento de dados sensíveis", "relacionamento com fornecedores", "backup")
+
+
+def question(index):
+    return f"Pergunta {index}: o que a política diz sobre {TOPICS[index % len(TOPICS)]}?"
+
+
+# --- MEDIDAS ---
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def summarize(samples):
+    return {
+        "count": len(samples),
+        "mean_ms": sum(samples) / len(samples) * 1000 if samples else 0.0,
+        "p50_ms": percentile(samples, 50) * 1000,
+        "p95_ms": percentile(samples, 95) * 1000,
+        "p99_ms": percentile(samples, 99) * 1000,
+        "max_ms": max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def peak_rss_mb():
+    # ru_maxrss vem em KB no Linux e em bytes no macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class StageTimer:
+    # Envolve funções dos módulos do app para somar o tempo de cada etapa.
+    STAGES = (
+        ("assets", "assets", "get_display_data_uri"),
+        ("faq_match", "faq", "match"),
+        ("history_render", "history_view", "render_history"),
+        ("history_build", "context", "ConversationContext.build_history"),
+        ("retrieval", "chat_pipeline", "prepare"),
+        ("cache_lookup", "response_cache", "get"),
+        ("model_stream", "streaming", "stream_to_placeholder"),
+    )
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {}
+
+    def record(self, stage, elapsed):
+        with self.lock:
+            self.samples.setdefault(stage, []).append(elapsed)
+
+    def _wrap(self, stage, function):
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - started)
+            if stage == "model_stream" and result.time_to_first_chunk is not None:
+                self.record("model_first_chunk", result.time_to_first_chunk)
+            return result
+        return timed
+
+    def install(self):
+        import importlib
+
+        for stage, module_name, attribute in self.STAGES:
+            target = importlib.import_module(module_name)
+            *owners, name = attribute.split(".")
+            for owner in owners:
+                target = getattr(target, owner)
+            setattr(target, name, self._wrap(stage, getattr(target, name)))
+
+    def take(self):
+        with self.lock:
+            samples, self.samples = self.samples, {}
+        return {stage: summarize(values) | {"total_ms": sum(values) * 1000} for stage, values in samples.items()}
+
+
+# --- CENÁRIOS ---
+
+class Session:
+    def __init__(self, timeout):
+        from streamlit.testing.v1 import AppTest
+
+        self.app = AppTest.from_file(MAIN_PATH, default_timeout=timeout)
+        self.errors = 0
+
+    def _timed(self, action):
+        started = time.perf_counter()
+        action()
+        elapsed = time.perf_counter() - started
+        if self.app.exception or self.app.error:
+            self.errors += 1
+        return elapsed
+
+    def open(self):
+        return self._timed(self.app.run)
+
+    def ask(self, text):
+        return self._timed(lambda: self.app.chat_input[0].set_value(text).run())
+
+    def click_faq(self, index=0):
+        return self._timed(lambda: self.app.button(key=f"faq_btn_{index}").click().run())
+
+
+# Processo novo a cada repetição: mede o que um pod recém-criado paga até
+# responder o primeiro clique numa FAQ (imports, primeira página e clique) e
+# confere se o SDK do modelo ficou de fora.
+PROCESS_START_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+framework = time.perf_counter()
+app = AppTest.from_file(sys.argv[1], default_timeout=float(sys.argv[2]))
+app.run()
+first_page = time.perf_counter()
+app.button(key="faq_btn_0").click().run()
+done = time.perf_counter()
+print(json.dumps({
+    "framework_import": framework - started,
+    "first_page": first_page - framework,
+    "first_faq_click": done - first_page,
+    "errors": int(bool(app.exception or app.error)),
+    "sdk_loaded": "google.generativeai" in sys.modules,
+}))
+"""
+
+
+def run_process_start(args, timer):
+    samples, errors = [], 0
+    for _ in range(args.iterations):
+        started = time.perf_counter()
+        child = subprocess.run([sys.executable, "-c", PROCESS_START_CHILD, MAIN_PATH, str(args.timeout)],
+                               cwd=BASE_DIR, capture_output=True, text=True)
+        samples.append(time.perf_counter() - started)
+        if child.returncode != 0:
+            errors += 1
+            print(child.stderr[-2000:], file=sys.stderr)
+            continue
+        report = json.loads(child.stdout.strip().splitlines()[-1])
+        errors += report.pop("errors")
+        if report.pop("sdk_loaded"):
+            print("Aviso: o SDK do modelo foi importado antes de qualquer pergunta digitada.")
+        for stage, seconds in report.items():
+            timer.record(stage, seconds)
+    return samples, errors, len(samples)
+
+
+def run_cold_start(args):
+    samples, errors = [], 0
+    for _ in range(args.iterations):
+        session = Session(args.timeout)
+        samples.append(session.open())
+        errors += session.errors
+    return samples, errors, len(samples)
+
+
+def run_faq_click(args):
+    samples, errors = [], 0
+    session = Session(args.timeout)
+    session.open()
+    for index in range(args.iterations):
+        samples.append(session.click_faq(index % 4))
+    return samples, session.errors, len(samples)
+
+
+def run_chat(args, turns):
+    session = Session(args.timeout)
+    session.open()
+    samples = [session.ask(question(index)) for index in range(turns)]
+    return samples, session.errors, len(samples)
+
+
+def run_short_chat(args):
+    return run_chat(args, args.short_turns)
+
+
+def run_long_chat(args):
+    return run_chat(args, args.long_turns)
+
+
+def run_concurrent(args):
+    samples, errors = [], [0]
+    lock = threading.Lock()
+
+    def worker(offset):
+        session = Session(args.timeout)
+        session.open()
+        local = [session.ask(question(offset + index)) for index in range(args.short_turns)]
+        with lock:
+            samples.extend(local)
+            errors[0] += session.errors
+
+    threads = [threading.Thread(target=worker, args=(index * 101,)) for index in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, errors[0], len(samples)
+
+
+RUNNERS = {
+    "cold_start": run_cold_start,
+    "faq_click": run_faq_click,
+    "short_chat": run_short_chat,
+    "long_chat": run_long_chat,
+    "concurrent": run_concurrent,
+}
+
+
+# --- EXECUÇÃO ---
+
+def configure_environment(args, server_url, data_dir):
+    # Precisa rodar antes de importar os módulos do app: as configurações são
+    # lidas na importação.
+    os.environ.update({
+        "EMI_BACKEND": "fake",
+        "EMI_FAKE_SERVER_URL": server_url,
+        "EMI_DATA_DIR": data_dir,
+        "EMI_CACHE": "1" if args.cache else "0",
+        "EMI_WARM_UP": "0",
+        "EMI_METRICS_LOG": "off",
+        "EMI_SESSION_RATE_PER_MIN": "1000000",
+        "EMI_SESSION_BURST": "1000000",
+    })
+    os.environ.pop("GEMINI_API_KEY", None)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results):
+    print(f"{'cenário':<12} {'n':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'req/s':>8} {'RSS MB':>8} {'erros':>6}")
+    for name, result in results.items():
+        latency = result["latency"]
+        print(f"{name:<12} {latency['count']:>5} {latency['p50_ms']:>9.1f} {latency['p95_ms']:>9.1f} "
+              f"{latency['p99_ms']:>9.1f} {result['throughput_rps']:>8.2f} {result['peak_rss_mb']:>8.1f} "
+              f"{result['errors']:>6}")
+        for stage, stats in sorted(result["stages"].items(), key=lambda item: -item[1]["total_ms"]):
+            print(f"    {stage:<18} n={stats['count']:<5} p50 {stats['p50_ms']:8.2f} ms  p95 {stats['p95_ms']:8.2f} ms")
+
+
+def print_comparison(results, baseline_path):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    print(f"\nComparação com {baseline_path} (commit {baseline.get('commit')}):")
+    for name, result in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        changes = []
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            before, after = previous["latency"][metric], result["latency"][metric]
+            change = (after - before) / before if before else 0.0
+            changes.append(f"{metric} {before:.1f} -> {after:.1f} ({change:+.0%})")
+        print(f"  {name:<12} " + " | ".join(changes))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark do caminho de uma pergunta no CHAT EMI.")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS,
+                        help="Cenário a executar (pode repetir; padrão: todos).")
+    parser.add_argument("--iterations", type=int, default=10, help="Repetições de process_start, cold_start e faq_click.")
+    parser.add_argument("--short-turns", type=int, default=5)
+    parser.add_argument("--long-turns", type=int, default=200)
+    parser.add_argument("--sessions", type=int, default=8, help="Sessões simultâneas no cenário concurrent.")
+    parser.add_argument("--latency", type=float, default=0.05, help="Latência do modelo simulado (s).")
+    parser.add_argument("--tokens-per-s", type=float, default=2000.0)
+    parser.add_argument("--answer-tokens", type=int, default=120)
+    parser.add_argument("--cache", action="store_true", help="Mantém o cache de respostas ligado.")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Prazo de cada execução do script (s).")
+    parser.add_argument("--output", help="Arquivo JSON de saída (padrão: bench_results/<data>-<commit>.json).")
+    parser.add_argument("--compare", help="JSON de uma execução anterior para comparar.")
+    args = parser.parse_args(argv)
+
+    import fake_server
+
+    server = fake_server.start_in_thread(latency=args.latency, tokens_per_s=args.tokens_per_s,
+                                         answer_tokens=args.answer_tokens)
+    data_dir = tempfile.mkdtemp(prefix="bench_chat_")
+    configure_environment(args, server.url, data_dir)
+    timer = StageTimer()
+    timer.install()
+    runners = dict(RUNNERS, process_start=functools.partial(run_process_start, timer=timer))
+
+    results = {}
+    try:
+        for name in args.scenario or SCENARIOS:
+            print(f"Executando {name}...", flush=True)
+            started = time.perf_counter()
+            samples, errors, requests = runners[name](args)
+            wall = time.perf_counter() - started
+            results[name] = {
+                "latency": summarize(samples),
+                "throughput_rps": requests / wall if wall else 0.0,
+                "wall_s": wall,
+                "peak_rss_mb": peak_rss_mb(),
+                "errors": errors,
+                "stages": timer.take(),
+            }
+    finally:
+        server.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": results,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{report['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    print_results(results)
+    print(f"\nResultados gravados em {output}")
+    if args.compare:
+        print_comparison(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
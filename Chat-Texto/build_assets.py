@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from PIL import Image
+
+import assets
+from assets import BASE_DIR, BUILD_DIR_NAME, MANIFEST_NAME, MANIFEST_VERSION
+
+# --- PIPELINE DE BUILD DAS IMAGENS ---
+# Gera versões das imagens no tamanho em que são exibidas pelo CSS do app,
+# em WebP e PNG (JPEG para imagens opacas), e um manifesto que o main.py lê na inicialização.
+# Uso: python build_assets.py [--scale 2]
+
+# Tamanho de exibição em pixels CSS (largura, altura); None mantém a proporção.
+# Os valores acompanham as regras de page_shell.CUSTOM_CSS.
+ASSET_SPECS = {
+    "nctech_avatar.png": (70, 70),     # avatar do chat (chatAvatarIcon img)
+    "logo_emi.png": (280, None),       # .main-logo
+    "logo_ems.png": (None, 35),        # .footer-logos img
+    "logo_nctech.png": (None, 35),     # .footer-logos img
+    "logo_gruponc.png": (None, 35),    # .footer-logos img
+    "background_blur_ai.jpg": (1280, None),  # fundo desfocado; não precisa de resolução total
+}
+
+WEBP_QUALITY = 82
+BACKGROUND_WEBP_QUALITY = 60
+
+
+def target_size(original_size, display_size, scale):
+    width, height = original_size
+    display_width, display_height = display_size
+    if display_width and display_height:
+        target = (display_width * scale, display_height * scale)
+    elif display_width:
+        target_width = display_width * scale
+        target = (target_width, round(height * target_width / width))
+    else:
+        target_height = display_height * scale
+        target = (round(width * target_height / height), target_height)
+    # Nunca amplia a imagem original.
+    if target[0] >= width or target[1] >= height:
+        return original_size
+    return target
+
+
+def build_asset(name, display_size, scale):
+    source_path = os.path.join(BASE_DIR, name)
+    started = time.perf_counter()
+    with Image.open(source_path) as image:
+        image.load()
+        size = target_size(image.size, display_size, scale)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        has_alpha = image.mode in ("RGBA", "LA", "P")
+        image = image.convert("RGBA" if has_alpha else "RGB")
+
+        stem = os.path.splitext(name)[0]
+        quality = BACKGROUND_WEBP_QUALITY if name.startswith("background") else WEBP_QUALITY
+        # Variante sem perdas para logos/avatares com transparência;
+        # imagens opacas (o fundo) ganham uma variante JPEG em vez de PNG.
+        fallback_fmt = "png" if has_alpha else "jpeg"
+        variants = {
+            "webp": f"{BUILD_DIR_NAME}/{stem}.webp",
+            fallback_fmt: f"{BUILD_DIR_NAME}/{stem}.{'png' if has_alpha else 'jpg'}",
+        }
+        image.save(os.path.join(BASE_DIR, variants["webp"]), "WEBP", quality=quality, method=6)
+        if has_alpha:
+            # PNG paletizado é bem menor e suficiente para logos com poucas cores.
+            png_image = image.quantize(colors=256, method=Image.Quantize.FASTOCTREE)
+            png_image.save(os.path.join(BASE_DIR, variants["png"]), "PNG", optimize=True)
+        else:
+            image.save(os.path.join(BASE_DIR, variants["jpeg"]), "JPEG", quality=quality, optimize=True, progressive=True)
+
+    source_stat = os.stat(source_path)
+    entry = {
+        "source_sha256": assets.file_sha256(source_path),
+        "source_size": source_stat.st_size,
+        "width": size[0],
+        "height": size[1],
+        "variants": variants,
+        "bytes": {
+            fmt: os.path.getsize(os.path.join(BASE_DIR, path)) for fmt, path in variants.items()
+        },
+    }
+    return entry, time.perf_counter() - started
+
+
+def build(scale=2):
+    build_dir = os.path.join(BASE_DIR, BUILD_DIR_NAME)
+    os.makedirs(build_dir, exist_ok=True)
+
+    manifest = {"version": MANIFEST_VERSION, "scale": scale, "assets": {}}
+    for name, display_size in ASSET_SPECS.items():
+        source_path = os.path.join(BASE_DIR, name)
+        if not os.path.exists(source_path):
+            print(f"AVISO: '{name}' não encontrado, ignorando.")
+            continue
+        entry, elapsed = build_asset(name, display_size, scale)
+        manifest["assets"][name] = entry
+        sizes = ", ".join(f"{fmt} {size / 1024:.1f} KB" for fmt, size in entry["bytes"].items())
+        print(
+            f"{name}: {entry['source_size'] / 1024:.1f} KB -> {sizes} "
+            f"({entry['width']}x{entry['height']}, {elapsed * 1000:.0f} ms)"
+        )
+
+    manifest_path = os.path.join(build_dir, MANIFEST_NAME)
+    tmp_path = manifest_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    os.replace(tmp_path, manifest_path)
+    print(f"Manifesto gravado em {manifest_path}")
+    return manifest
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera as imagens otimizadas do CHAT EMI.")
+    parser.add_argument(
+        "--scale", type=int, default=2,
+        help="Densidade de pixels gerada em relação ao tamanho CSS (padrão: 2, para telas HiDPI).",
+    )
+    args = parser.parse_args(argv)
+    build(scale=args.scale)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,71 @@
+from contextlib import contextmanager
+
+import backends
+import response_cache
+import retrieval
+import scheduler
+import single_flight
+
+# --- PREPARAÇÃO DE UMA PERGUNTA LIVRE ---
+# Reúne o que é preciso para responder a uma pergunta que não veio do FAQ:
+# trechos recuperados dos documentos, prompt final enviado ao modelo e a
+# chave do cache de respostas.
+
+
+class PreparedRequest:
+    __slots__ = ("prompt", "history", "chunks", "api_prompt", "model_name", "cache_key", "flight")
+
+    def __init__(self, prompt, history, chunks, api_prompt, model_name, cache_key):
+        self.prompt = prompt
+        self.history = history
+        self.chunks = chunks
+        self.api_prompt = api_prompt
+        self.model_name = model_name
+        self.cache_key = cache_key
+        # Chamada em andamento que esta pergunta acompanha (ver admit()).
+        self.flight = None
+
+
+def prepare(prompt, history, model_name=None):
+    model_name = model_name or backends.current_model_name()
+    chunks = retrieval.retrieve(prompt)
+    api_prompt = retrieval.build_prompt(prompt, chunks)
+    cache_key = response_cache.make_key(prompt, response_cache.context_fingerprint(history, chunks), model_name)
+    return PreparedRequest(prompt, history, chunks, api_prompt, model_name, cache_key)
+
+
+def stream_answer(backend, request):
+    # Pedaços da resposta do modelo. Sessões com a mesma pergunta e o mesmo
+    # contexto, ao mesmo tempo, compartilham uma única chamada.
+    if request.flight is not None:
+        flight, request.flight = request.flight, None
+        return single_flight.follow(flight)
+
+    def open_stream():
+        chat = backend.start_chat(request.history)
+        return backend.stream(chat, request.api_prompt)
+
+    return single_flight.stream(request.cache_key, lambda: scheduler.get_scheduler().with_backoff(open_stream))
+
+
+@contextmanager
+def admit(request, session_id, on_wait=None):
+    # Espera a vez da sessão (limite por sessão, fila e teto de chamadas). Quem
+    # só vai acompanhar uma chamada já em andamento não ocupa lugar na fila; a
+    # sessão entra nela já aqui (single_flight.join), para que só quem tem um
+    # lugar na fila possa abrir uma chamada nova ao modelo.
+    request.flight = single_flight.join(request.cache_key)
+    try:
+        with scheduler.get_scheduler().admit(session_id, on_wait=on_wait, shared=request.flight is not None):
+            yield
+    finally:
+        if request.flight is not None:
+            # Admitida como seguidora, mas não chegou a acompanhar o stream.
+            single_flight.leave(request.flight)
+            request.flight = None
+
+
+def wait_message(state, value):
+    if state == "rate_limited":
+        return f"⏳ Você enviou muitas perguntas seguidas. Aguarde {value:.0f} s…"
+    return f"⏳ Muitas perguntas no momento. Sua posição na fila: {value}º…"
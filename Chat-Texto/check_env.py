@@ -24,13 +24,14 @@ expected_packages = [
 ]
 
 print("\n--- Installed Packages (relevant) ---")
-import pkg_resources
-installed_packages = {d.project_name: d.version for d in pkg_resources.working_set}
+# Consulta só os metadados de cada pacote esperado, em vez de varrer todo o
+# ambiente com o pkg_resources (lento e obsoleto).
+from importlib import metadata
 
 for pkg_name in expected_packages:
-    if pkg_name.lower() in [k.lower() for k in installed_packages.keys()]:
-        # Encontra o nome exato do pacote instalado (com hífens vs underscores)
-        actual_pkg_name = [k for k in installed_packages.keys() if k.lower() == pkg_name.lower()][0]
-        print(f"{actual_pkg_name}: {installed_packages[actual_pkg_name]}")
+    try:
+        distribution = metadata.distribution(pkg_name)
+    except metadata.PackageNotFoundError:
+        print(f"{pkg_name}: NOT FOUND")
     else:
-        print(f"{pkg_name}: NOT FOUND")
\ No newline at end of file
+        print(f"{distribution.metadata['Name']}: {distribution.version}")
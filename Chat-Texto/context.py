@@ -0,0 +1,160 @@
+import os
+from collections import deque
+
+from text_utils import collapse_spaces, estimate_tokens, words
+
+# --- CONTEXTO DA CONVERSA COM ORÇAMENTO DE TOKENS ---
+# Em vez de reenviar todo o histórico a cada pergunta, mantém as trocas mais
+# recentes na íntegra e resume as mais antigas num resumo rolante, guardado
+# na sessão. Saudação e respostas de FAQ (mensagens "estáticas") só entram
+# quando têm relação com a pergunta atual. O histórico é montado de forma
+# incremental: cada mensagem de st.session_state.messages é processada uma
+# única vez.
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("EMI_CONTEXT_TOKEN_BUDGET", "3000"))
+SUMMARY_SHARE = 0.25
+STATIC_SOURCES = ("greeting", "faq")
+# Avisos do app no lugar de uma resposta (resposta vazia, fila cheia, cota
+# ou erro da IA): não são contexto para o modelo nem entram na chave do cache.
+SKIPPED_SOURCES = ("empty", "error")
+RELEVANCE_THRESHOLD = 0.5
+SUMMARY_LINE_CHARS = 240
+
+
+class Turn:
+    __slots__ = ("user", "assistant", "source", "tokens")
+
+    def __init__(self, user, assistant, source=None):
+        self.user = user
+        self.assistant = assistant
+        self.source = source
+        self.tokens = estimate_tokens(user) + estimate_tokens(assistant)
+
+    def to_api(self):
+        return [
+            {"role": "user", "parts": [self.user]},
+            {"role": "model", "parts": [self.assistant]},
+        ]
+
+
+def extractive_summary(turn):
+    # Resumo local (sem chamada ao modelo): pergunta + primeira frase da resposta.
+    question = collapse_spaces(turn.user)
+    answer = collapse_spaces(turn.assistant).split(". ")[0]
+    line = f"- Usuário: {question} | Assistente: {answer}"
+    if len(line) > SUMMARY_LINE_CHARS:
+        line = line[:SUMMARY_LINE_CHARS - 1] + "…"
+    return line
+
+
+def _keywords(text):
+    return {w for w in words(text) if len(w) > 3}
+
+
+class ConversationContext:
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET, summarizer=extractive_summary):
+        self.token_budget = token_budget
+        self.summary_budget = int(token_budget * SUMMARY_SHARE)
+        self.recent_budget = token_budget - self.summary_budget
+        self.summarizer = summarizer
+        self._reset()
+
+    def _reset(self):
+        self.recent = deque()
+        self.recent_tokens = 0
+        self.summary_lines = deque()
+        self.summary_tokens = 0
+        self.static_turns = {}
+
+        self._consumed = 0
+        self._pending_user = None
+
+    # -- ingestão incremental --
+
+    def sync(self, messages):
+        # Processa só as mensagens novas desde a última chamada.
+        if len(messages) < self._consumed:
+            # A lista foi reiniciada (ex.: nova conversa); recomeça do zero.
+            self._reset()
+        for message in messages[self._consumed:]:
+            self._add_message(message)
+        self._consumed = len(messages)
+
+    def _add_message(self, message):
+        if message["role"] == "user":
+            self._pending_user = message["content"]
+            return
+        if self._pending_user is None:
+            # Mensagem do assistente sem pergunta (a saudação inicial).
+            return
+        # Cada lado da troca cabe em metade do orçamento das recentes.
+        max_chars = self.recent_budget * 2
+        turn = Turn(self._pending_user[:max_chars], message["content"][:max_chars], message.get("source"))
+        self._pending_user = None
+        if turn.source in SKIPPED_SOURCES:
+            return
+        if turn.source in STATIC_SOURCES:
+            # Uma entrada por pergunta, mesmo que o FAQ seja clicado várias vezes.
+            self.static_turns[turn.user] = turn
+        else:
+            self._add_turn(turn)
+
+    def _add_turn(self, turn):
+        self.recent.append(turn)
+        self.recent_tokens += turn.tokens
+        # Sempre mantém ao menos a troca mais recente na íntegra.
+        while self.recent_tokens > self.recent_budget and len(self.recent) > 1:
+            old = self.recent.popleft()
+            self.recent_tokens -= old.tokens
+            self._fold_into_summary(old)
+
+    def _fold_into_summary(self, turn):
+        line = self.summarizer(turn)
+        self.summary_lines.append(line)
+        self.summary_tokens += estimate_tokens(line)
+        while self.summary_tokens > self.summary_budget and len(self.summary_lines) > 1:
+            self.summary_tokens -= estimate_tokens(self.summary_lines.popleft())
+
+    # -- montagem do histórico --
+
+    def _relevant_static(self, prompt, budget):
+        prompt_words = _keywords(prompt)
+        if not prompt_words:
+            return []
+        best, best_score = None, 0.0
+        for turn in self.static_turns.values():
+            question_words = _keywords(turn.user)
+            if not question_words:
+                continue
+            score = len(prompt_words & question_words) / len(question_words)
+            if score > best_score:
+                best, best_score = turn, score
+        if best is not None and best_score >= RELEVANCE_THRESHOLD and best.tokens <= budget:
+            return [best]
+        return []
+
+    def build_history(self, messages, prompt):
+        # `messages` já contém `prompt` como última mensagem do usuário;
+        # ela fica pendente e não entra no histórico enviado.
+        self.sync(messages)
+        history = []
+        if self.summary_lines:
+            summary = "\n".join(self.summary_lines)
+            history.append({"role": "user", "parts": [f"Resumo da conversa anterior:\n{summary}"]})
+            history.append({"role": "model", "parts": ["Entendido, vou considerar esse contexto."]})
+
+        for turn in self._relevant_static(prompt, self.recent_budget - self.recent_tokens):
+            history.extend(turn.to_api())
+        for turn in self.recent:
+            history.extend(turn.to_api())
+        return history
+
+    def stats(self):
+        return {
+            "recent_turns": len(self.recent),
+            "recent_tokens": self.recent_tokens,
+            "summary_lines": len(self.summary_lines),
+            "summary_tokens": self.summary_tokens,
+            "static_turns": len(self.static_turns),
+            "consumed_messages": self._consumed,
+        }
@@ -0,0 +1,301 @@
+import argparse
+import atexit
+import os
+import queue
+import re
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+import weakref
+from collections import deque
+
+# --- ARMAZENAMENTO DAS CONVERSAS ---
+# As mensagens de cada sessão ficam num SQLite (modo WAL) em data/, e não
+# mais numa lista que cresce sem limite na memória do servidor:
+#   * a sessão guarda só as últimas EMI_SESSION_WINDOW_MESSAGES mensagens,
+#     como tuplas (papel, texto, origem); as mais antigas são lidas do banco
+#     quando alguém pede (ex.: o arquivo paginado do histórico);
+#   * as gravações são enfileiradas e feitas em lote por uma thread própria,
+#     sem atrasar a interface;
+#   * o id da sessão vai na URL (?sessao=...), então a conversa continua de
+#     onde parou mesmo depois de reiniciar o servidor;
+#   * a posição (seq) de cada mensagem é dada pela própria Conversation. Se
+#     duas abas estiverem abertas na mesma URL, a primeira a gravar uma
+#     posição que a outra já usou é separada numa sessão nova (com um novo
+#     id e uma cópia das mensagens anteriores a esse ponto): cada aba segue
+#     com a sua conversa, sem misturar nem sobrescrever mensagens.
+# Uso: python conversation_store.py --stats
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("EMI_DATA_DIR", os.path.join(BASE_DIR, "data"))
+STORE_PATH = os.environ.get("EMI_CONVERSATIONS_PATH", os.path.join(DATA_DIR, "conversations.sqlite3"))
+
+WINDOW_MESSAGES = int(os.environ.get("EMI_SESSION_WINDOW_MESSAGES", "100"))
+FLUSH_INTERVAL_S = float(os.environ.get("EMI_STORE_FLUSH_INTERVAL", "0.25"))
+BATCH_MAX = 500
+ITER_PAGE = 200
+
+_SESSION_ID = re.compile(r"^[0-9a-f]{32}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    source TEXT,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (session_id, seq)
+) WITHOUT ROWID;
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_queue = queue.Queue()
+_state = {"writer": None}
+_stats = {"written": 0, "batches": 0, "errors": 0, "forks": 0}
+_live = weakref.WeakSet()
+
+
+def _connect(path=STORE_PATH):
+    connection = getattr(_local, "connection", None)
+    if connection is None or getattr(_local, "path", None) != path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        _local.connection = connection
+        _local.path = path
+    return connection
+
+
+# --- GRAVAÇÃO EM LOTE (WRITE-BEHIND) ---
+
+_INSERT_MESSAGE = (
+    "INSERT INTO messages (session_id, seq, role, content, source, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+)
+
+
+def _fork(connection, conversation, seq):
+    # Chamado na transação de gravação, quando `seq` já foi usada por outra
+    # aba na mesma sessão: a conversa passa para um id novo, com uma cópia
+    # das mensagens anteriores a `seq` (o trecho em comum e as suas).
+    old_id, new_id = conversation.session_id, uuid.uuid4().hex
+    connection.execute(
+        "INSERT INTO messages (session_id, seq, role, content, source, created_at) "
+        "SELECT ?, seq, role, content, source, created_at FROM messages WHERE session_id = ? AND seq < ?",
+        (new_id, old_id, seq),
+    )
+    conversation.session_id = new_id
+    with _lock:
+        _stats["forks"] += 1
+
+
+def _write_batch(connection, batch):
+    now = time.time()
+    # IMMEDIATE: o lock de escrita vem antes de conferir as posições, inclusive entre processos.
+    connection.execute("BEGIN IMMEDIATE")
+    try:
+        for conversation, seq, (role, content, source), created_at in batch:
+            try:
+                connection.execute(_INSERT_MESSAGE, (conversation.session_id, seq, role, content, source, created_at))
+            except sqlite3.IntegrityError:
+                _fork(connection, conversation, seq)
+                connection.execute(_INSERT_MESSAGE, (conversation.session_id, seq, role, content, source, created_at))
+        connection.executemany(
+            "INSERT INTO sessions (id, created_at, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET updated_at = excluded.updated_at",
+            [(session_id, now, now) for session_id in {item[0].session_id for item in batch}],
+        )
+        connection.execute("COMMIT")
+    except Exception:
+        connection.execute("ROLLBACK")
+        raise
+
+
+def _writer_loop():
+    connection = _connect()
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + FLUSH_INTERVAL_S
+        while len(batch) < BATCH_MAX:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        try:
+            _write_batch(connection, batch)
+            with _lock:
+                _stats["written"] += len(batch)
+                _stats["batches"] += 1
+        except sqlite3.Error as e:
+            with _lock:
+                _stats["errors"] += 1
+            print(f"Aviso: falha ao gravar {len(batch)} mensagens da conversa: {e}")
+        finally:
+            for _ in batch:
+                _queue.task_done()
+
+
+def _enqueue(conversation, seq, row):
+    if _state["writer"] is None:
+        with _lock:
+            if _state["writer"] is None:
+                writer = threading.Thread(target=_writer_loop, name="conversation-writer", daemon=True)
+                writer.start()
+                _state["writer"] = writer
+    _queue.put((conversation, seq, row, time.time()))
+
+
+def flush():
+    # Espera as mensagens enfileiradas chegarem ao banco.
+    if _state["writer"] is not None:
+        _queue.join()
+
+
+atexit.register(flush)
+
+
+# --- LEITURA ---
+
+def _read(conversation, start, stop):
+    if _queue.unfinished_tasks:
+        flush()
+    # O id é lido depois do flush: a gravação pode ter separado a conversa.
+    try:
+        return _connect().execute(
+            "SELECT role, content, source FROM messages WHERE session_id = ? AND seq >= ? AND seq < ? ORDER BY seq",
+            (conversation.session_id, start, stop),
+        ).fetchall()
+    except sqlite3.Error as e:
+        print(f"Aviso: falha ao ler mensagens antigas da conversa: {e}")
+        return []
+
+
+def _to_message(row):
+    role, content, source = row
+    message = {"role": role, "content": content}
+    if source is not None:
+        message["source"] = source
+    return message
+
+
+class Conversation:
+    # Lista de mensagens de uma sessão, com a mesma interface usada pelo app
+    # (len, índices, fatias, append), mas que guarda na memória só a janela
+    # das mensagens mais recentes. `session_id` pode mudar depois de um
+    # append, se a gravação separar a conversa numa sessão nova.
+
+    def __init__(self, session_id, total=0, recent=(), window=WINDOW_MESSAGES):
+        self.session_id = session_id
+        self.total = total
+        self.recent = deque(recent, maxlen=window)
+        with _lock:
+            _live.add(self)
+
+    @classmethod
+    def load(cls, session_id, window=WINDOW_MESSAGES):
+        flush()
+        connection = _connect()
+        total = connection.execute(
+            "SELECT COALESCE(MAX(seq) + 1, 0) FROM messages WHERE session_id = ?", (session_id,)
+        ).fetchone()[0]
+        recent = connection.execute(
+            "SELECT role, content, source FROM messages WHERE session_id = ? AND seq >= ? ORDER BY seq",
+            (session_id, total - window),
+        ).fetchall()
+        return cls(session_id, total, recent, window)
+
+    def _range(self, start, stop):
+        first_in_memory = self.total - len(self.recent)
+        rows = []
+        if start < first_in_memory:
+            rows.extend(_read(self, start, min(stop, first_in_memory)))
+        for index in range(max(start, first_in_memory), stop):
+            rows.append(self.recent[index - first_in_memory])
+        return [_to_message(row) for row in rows]
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self.total)
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+            return self._range(start, stop) if start < stop else []
+        if index < 0:
+            index += self.total
+        if not 0 <= index < self.total:
+            raise IndexError("índice de mensagem fora da conversa")
+        return self._range(index, index + 1)[0]
+
+    def __iter__(self):
+        for start in range(0, self.total, ITER_PAGE):
+            yield from self._range(start, min(self.total, start + ITER_PAGE))
+
+    def append(self, message):
+        row = (message["role"], message["content"], message.get("source"))
+        seq = self.total
+        self.recent.append(row)
+        self.total += 1
+        _enqueue(self, seq, row)
+
+    def memory_bytes(self):
+        size = sys.getsizeof(self) + sys.getsizeof(self.recent)
+        for row in self.recent:
+            size += sys.getsizeof(row) + sum(sys.getsizeof(value) for value in row if value is not None)
+        return size
+
+
+def open_session(session_id=None):
+    # Retoma a conversa de `session_id` se ela existir no banco; senão, abre
+    # uma nova com um id aleatório.
+    if session_id and _SESSION_ID.match(session_id):
+        try:
+            conversation = Conversation.load(session_id)
+            if len(conversation):
+                return conversation
+        except sqlite3.Error as e:
+            # O id dá acesso à conversa; não vai para o log.
+            print(f"Aviso: não foi possível retomar a conversa indicada na URL: {e}")
+    return Conversation(uuid.uuid4().hex)
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        live = list(_live)
+    stats["pending"] = _queue.unfinished_tasks
+    stats["live_sessions"] = len(live)
+    stats["window_messages"] = sum(len(conversation.recent) for conversation in live)
+    stats["memory_bytes"] = sum(conversation.memory_bytes() for conversation in live)
+    stats["memory_bytes_per_session"] = stats["memory_bytes"] / len(live) if live else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mostra o tamanho do armazenamento de conversas do CHAT EMI.")
+    parser.add_argument("--stats", action="store_true", help="Mostra sessões, mensagens e tamanho do banco.")
+    parser.parse_args(argv)
+    connection = _connect()
+    sessions = connection.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+    messages = connection.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    size = sum(os.path.getsize(STORE_PATH + suffix) for suffix in ("", "-wal") if os.path.exists(STORE_PATH + suffix))
+    print(f"Sessões: {sessions} | mensagens: {messages} | banco: {size / 1024:.0f} KB ({STORE_PATH})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,101 @@
+import logging
+import os
+import re
+
+from text_utils import collapse_spaces
+
+# --- EXTRAÇÃO E FRAGMENTAÇÃO DOS PDFs ---
+# Lê os documentos de governança em pdfs/ e os divide em trechos (chunks)
+# pequenos o bastante para serem enviados ao modelo como contexto.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(BASE_DIR, "pdfs")
+
+CHUNK_CHARS = 1200
+CHUNK_OVERLAP_CHARS = 200
+
+_HYPHEN_BREAK_RE = re.compile(r"(\w)-\s*\n\s*(\w)")
+_SENTENCE_RE = re.compile(r"(?<=[.;:!?])\s+")
+
+# O pypdf avisa sobre fontes que não consegue decodificar por completo; o texto
+# extraído continua utilizável, então os avisos só poluem o console.
+logging.getLogger("pypdf").setLevel(logging.ERROR)
+
+
+def list_pdfs(pdf_dir=PDF_DIR):
+    # Inclui subpastas: o corpus real é organizado por área/documento.
+    paths = []
+    for root, _, names in os.walk(pdf_dir):
+        paths.extend(os.path.join(root, name) for name in names if name.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def source_name(path, pdf_dir=PDF_DIR):
+    return os.path.relpath(path, pdf_dir).replace(os.sep, "/")
+
+
+def document_title(path):
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def clean_page_text(text):
+    text = _HYPHEN_BREAK_RE.sub(r"\1\2", text)
+    return collapse_spaces(text)
+
+
+def extract_pages(path):
+    # Retorna [(número_da_página, texto)] com páginas vazias descartadas.
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = []
+    for number, page in enumerate(reader.pages, start=1):
+        text = clean_page_text(page.extract_text() or "")
+        if text:
+            pages.append((number, text))
+    return pages
+
+
+def _split_long(sentence, size):
+    return [sentence[start:start + size] for start in range(0, len(sentence), size)]
+
+
+def chunk_pages(pages, source, chunk_chars=CHUNK_CHARS, overlap_chars=CHUNK_OVERLAP_CHARS):
+    # Agrupa frases até ~chunk_chars caracteres, repetindo o final do trecho
+    # anterior (overlap) para não cortar o contexto de uma frase no meio.
+    chunks = []
+    current, current_len, current_page = [], 0, None
+
+    def flush():
+        if current:
+            chunks.append({
+                "id": f"{source}#{len(chunks)}",
+                "source": source,
+                "page": current_page,
+                "text": " ".join(current),
+            })
+
+    for number, text in pages:
+        for sentence in _SENTENCE_RE.split(text):
+            for piece in _split_long(sentence, chunk_chars):
+                if current and current_len + len(piece) + 1 > chunk_chars:
+                    flush()
+                    tail = []
+                    tail_len = 0
+                    for previous in reversed(current):
+                        if tail_len + len(previous) > overlap_chars:
+                            break
+                        tail.insert(0, previous)
+                        tail_len += len(previous) + 1
+                    current, current_len, current_page = tail, tail_len, number
+                if current_page is None:
+                    current_page = number
+                current.append(piece)
+                current_len += len(piece) + 1
+    flush()
+    return chunks
+
+
+def load_chunks(path, source=None):
+    source = source or source_name(path)
+    return chunk_pages(extract_pages(path), source)
@@ -0,0 +1,94 @@
+import hashlib
+import math
+import os
+
+from text_utils import content_words
+
+# --- EMBEDDERS PLUGÁVEIS ---
+# Todo embedder expõe `name`, `dim`, `embed_documents(textos)` e
+# `embed_query(texto)`, devolvendo vetores normalizados (norma 1).
+# O nome do embedder fica gravado no índice, para que as consultas usem
+# sempre o mesmo modelo que gerou os vetores.
+
+GEMINI_EMBEDDING_MODEL = os.environ.get("EMI_EMBEDDING_MODEL", "models/text-embedding-004")
+GEMINI_BATCH_SIZE = 100
+HASHING_DIM = 512
+
+
+def _normalize(vector):
+    norm = math.sqrt(sum(value * value for value in vector))
+    if not norm:
+        return vector
+    return [value / norm for value in vector]
+
+
+class HashingEmbedder:
+    # Embedder local e determinístico (hashing de palavras e bigramas).
+    # Não precisa de rede nem de chave de API: serve para testes e para rodar
+    # o índice offline.
+
+    def __init__(self, dim=HASHING_DIM):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed(self, text):
+        vector = [0.0] * self.dim
+        tokens = content_words(text)
+        features = tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dim
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        return _normalize(vector)
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+class GeminiEmbedder:
+    def __init__(self, api_key, model_name=GEMINI_EMBEDDING_MODEL):
+        import llm_client
+
+        llm_client.configure(api_key)
+        self.model_name = model_name
+        self.name = f"gemini:{model_name}"
+        self.dim = None
+
+    def _embed(self, content, task_type):
+        import google.generativeai as genai
+
+        result = genai.embed_content(model=self.model_name, content=content, task_type=task_type)
+        return result["embedding"]
+
+    def embed_documents(self, texts):
+        vectors = []
+        for start in range(0, len(texts), GEMINI_BATCH_SIZE):
+            batch = texts[start:start + GEMINI_BATCH_SIZE]
+            vectors.extend(_normalize(v) for v in self._embed(batch, "retrieval_document"))
+        if vectors:
+            self.dim = len(vectors[0])
+        return vectors
+
+    def embed_query(self, text):
+        return _normalize(self._embed(text, "retrieval_query"))
+
+
+def get_embedder(name=None):
+    # `name` pode ser "gemini", "hashing", "hashing-<dim>" ou o nome gravado
+    # num índice ("gemini:models/..."). Sem nome, usa EMI_EMBEDDER ou, na falta
+    # dela, Gemini quando há chave de API e o embedder local caso contrário.
+    api_key = os.environ.get("GEMINI_API_KEY")
+    name = name or os.environ.get("EMI_EMBEDDER") or ("gemini" if api_key else "hashing")
+    if name.startswith("hashing"):
+        _, _, dim = name.partition("-")
+        return HashingEmbedder(int(dim) if dim else HASHING_DIM)
+    if name.startswith("gemini"):
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY não definida; use EMI_EMBEDDER=hashing para rodar offline.")
+        _, _, model_name = name.partition(":")
+        return GeminiEmbedder(api_key, model_name or GEMINI_EMBEDDING_MODEL)
+    raise ValueError(f"Embedder desconhecido: {name}")
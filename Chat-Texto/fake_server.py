@@ -0,0 +1,201 @@
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- SERVIDOR LOCAL QUE SIMULA O GEMINI ---
+# Substituto do modelo para testes de carga e de concorrência sem chave de API
+# nem rede. Responde no mesmo formato usado por backends.FakeServerBackend e
+# simula latência até o primeiro pedaço, velocidade de geração (tokens/s),
+# erros (500) e estouro de cota (429), por probabilidade e por limite de
+# chamadas simultâneas.
+#
+#   python fake_server.py --port 8765 --latency 0.5 --tokens-per-s 40 --quota-rate 0.05
+#   EMI_BACKEND=fake EMI_FAKE_SERVER_URL=http://127.0.0.1:8765 streamlit run main.py
+#
+# Protocolo:
+#   POST /v1/chat  {"history": [...], "prompt": "...", "stream": true|false}
+#     stream=false -> {"text": "..."}
+#     stream=true  -> uma linha JSON por pedaço ({"text": "..."}), terminando
+#                     com {"done": true}
+#     429/500      -> {"error": "..."}
+#   GET /health    -> configuração e contadores
+
+DEFAULT_PORT = 8765
+FILLER = ("governança", "conduta", "política", "dados", "privacidade", "empresa", "colaboradores",
+          "segurança", "informação", "regras", "canal", "denúncias", "conformidade", "ética")
+
+
+class FakeConfig:
+    def __init__(self, latency=0.3, tokens_per_s=50.0, answer_tokens=120, chunk_tokens=4,
+                 error_rate=0.0, quota_rate=0.0, max_concurrent=0, seed=None):
+        self.latency = latency
+        self.tokens_per_s = tokens_per_s
+        self.answer_tokens = answer_tokens
+        self.chunk_tokens = chunk_tokens
+        self.error_rate = error_rate
+        self.quota_rate = quota_rate
+        self.max_concurrent = max_concurrent
+        self.random = random.Random(seed)
+
+    def to_dict(self):
+        return {name: value for name, value in vars(self).items() if name != "random"}
+
+
+def fake_answer(prompt, tokens):
+    # Resposta determinística: mesma pergunta, mesma resposta.
+    question = " ".join(prompt.split()[-12:])
+    words = [f"Resposta simulada para: {question}."]
+    seed = sum(map(ord, prompt))
+    for index in range(tokens):
+        words.append(FILLER[(seed + index * 7) % len(FILLER)])
+    return " ".join(words)
+
+
+class FakeGeminiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, config):
+        super().__init__(address, FakeGeminiHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.active = 0
+        self.stats = {"requests": 0, "streams": 0, "errors": 0, "quota": 0}
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGemini/1.0"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, payload, headers=()):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._json(404, {"error": "not found"})
+            return
+        with self.server.lock:
+            payload = {"ok": True, "config": self.server.config.to_dict(), "active": self.server.active,
+                       "stats": dict(self.server.stats)}
+        self._json(200, payload)
+
+    def do_POST(self):
+        if self.path != "/v1/chat":
+            self._json(404, {"error": "not found"})
+            return
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+        except ValueError:
+            self._json(400, {"error": "JSON inválido"})
+            return
+
+        server, config = self.server, self.server.config
+        with server.lock:
+            server.stats["requests"] += 1
+            roll = config.random.random()
+            over_limit = config.max_concurrent and server.active >= config.max_concurrent
+            if over_limit or roll < config.quota_rate:
+                server.stats["quota"] += 1
+                status = 429
+            elif roll < config.quota_rate + config.error_rate:
+                server.stats["errors"] += 1
+                status = 500
+            else:
+                server.active += 1
+                status = 200
+        if status == 429:
+            self._json(429, {"error": "Resource has been exhausted (e.g. check quota)."}, [("Retry-After", "1")])
+            return
+        if status == 500:
+            self._json(500, {"error": "Erro interno simulado."})
+            return
+
+        try:
+            self._answer(request, config)
+        finally:
+            with server.lock:
+                server.active -= 1
+
+    def _answer(self, request, config):
+        answer = fake_answer(request.get("prompt", ""), config.answer_tokens)
+        if config.latency:
+            time.sleep(config.latency)
+        if not request.get("stream"):
+            if config.tokens_per_s:
+                time.sleep(config.answer_tokens / config.tokens_per_s)
+            self._json(200, {"text": answer})
+            return
+
+        with self.server.lock:
+            self.server.stats["streams"] += 1
+        # HTTP/1.0: a conexão fecha no fim, então não é preciso Content-Length.
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson; charset=utf-8")
+        self.end_headers()
+        words = answer.split(" ")
+        step = max(1, config.chunk_tokens)
+        for start in range(0, len(words), step):
+            if start and config.tokens_per_s:
+                time.sleep(step / config.tokens_per_s)
+            piece = " ".join(words[start:start + step]) + " "
+            self.wfile.write(json.dumps({"text": piece}, ensure_ascii=False).encode("utf-8") + b"\n")
+            self.wfile.flush()
+        self.wfile.write(b'{"done": true}\n')
+
+
+def start_in_thread(host="127.0.0.1", port=0, **config):
+    # Sobe o servidor numa thread (port=0 escolhe uma porta livre); usado pelos
+    # benchmarks. Para encerrar: server.shutdown().
+    server = FakeGeminiServer((host, port), FakeConfig(**config))
+    threading.Thread(target=server.serve_forever, name="fake-gemini", daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor local que simula o Gemini para testes de carga.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--latency", type=float, default=0.3, help="Segundos até o primeiro pedaço (padrão: 0.3).")
+    parser.add_argument("--tokens-per-s", type=float, default=50.0, help="Velocidade de geração (padrão: 50).")
+    parser.add_argument("--answer-tokens", type=int, default=120, help="Tamanho da resposta em tokens (padrão: 120).")
+    parser.add_argument("--chunk-tokens", type=int, default=4, help="Tokens por pedaço do stream (padrão: 4).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Probabilidade de erro 500 (0 a 1).")
+    parser.add_argument("--quota-rate", type=float, default=0.0, help="Probabilidade de erro 429 (0 a 1).")
+    parser.add_argument("--max-concurrent", type=int, default=0,
+                        help="Acima deste número de chamadas simultâneas responde 429 (0 = sem limite).")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    config = FakeConfig(args.latency, args.tokens_per_s, args.answer_tokens, args.chunk_tokens,
+                        args.error_rate, args.quota_rate, args.max_concurrent, args.seed)
+    server = FakeGeminiServer((args.host, args.port), config)
+    print(f"Servidor simulado em {server.url} ({json.dumps(config.to_dict())})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+import difflib
+import heapq
+import json
+import os
+import threading
+from collections import Counter
+
+from text_utils import STOPWORDS, normalize_text
+
+# --- PERGUNTAS FREQUENTES (FAQ) ---
+# As perguntas e respostas vêm de um arquivo externo (faqs.json), recarregado
+# quando muda. Uma pergunta digitada é respondida na hora, sem chamar o modelo,
+# quando corresponde a uma entrada do FAQ em um destes níveis:
+#   1. exato, depois de normalizar caixa, acentos e pontuação;
+#   2. aproximado: candidatos por trigramas de caracteres (índice invertido
+#      pré-calculado), ordenados pela similaridade do difflib. Um candidato só
+#      é aceito se as palavras de conteúdo (e as negações) forem as mesmas,
+#      tolerando só erros de digitação em cada palavra: "políticas de
+#      compliance da NCTECH" não casa com a pergunta sobre a EMS, por mais
+#      parecidas que sejam as frases;
+#   3. semântico (opcional, EMI_FAQ_SEMANTIC=1): similaridade de embeddings.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+FAQ_PATH = os.environ.get("EMI_FAQ_PATH", os.path.join(BASE_DIR, "faqs.json"))
+
+SEMANTIC_ENABLED = os.environ.get("EMI_FAQ_SEMANTIC", "0") == "1"
+SEMANTIC_THRESHOLD = float(os.environ.get("EMI_FAQ_SEMANTIC_THRESHOLD", "0.9"))
+FUZZY_CANDIDATES = 5
+# Negações são stopwords, mas invertem o sentido da pergunta.
+NEGATIONS = frozenset(("nao", "nem", "sem", "nunca", "jamais", "nenhum", "nenhuma"))
+# Formas coloquiais que não mudam o sentido ("pra" = "para").
+FILLERS = frozenset(("pra", "pro", "pras", "pros", "ne"))
+# Erros de digitação tolerados por palavra (letras trocadas, faltando ou a
+# mais); palavras curtas e números precisam ser idênticos.
+TYPO_MIN_LENGTH = 4
+TYPO_LONG_WORD = 8
+MAX_FEATURED = 4
+
+
+def key_words(normalized):
+    return [word for word in normalized.split()
+            if word in NEGATIONS or (word not in STOPWORDS and word not in FILLERS)]
+
+
+def _edit_distance(a, b, limit):
+    # Levenshtein com transposição de letras vizinhas ("etcia" -> "etica"
+    # custa 1), com saída antecipada quando passa de `limit`.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    before, previous = None, list(range(len(b) + 1))
+    for i, char_a in enumerate(a, start=1):
+        current = [i]
+        for j, char_b in enumerate(b, start=1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b))
+            if i > 1 and j > 1 and char_a == b[j - 2] and a[i - 2] == char_b:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        if min(current) > limit:
+            return limit + 1
+        before, previous = previous, current
+    return previous[-1]
+
+
+def _same_word(a, b):
+    if a == b:
+        return True
+    shortest = min(len(a), len(b))
+    if shortest < TYPO_MIN_LENGTH or any(char.isdigit() for char in a + b):
+        return False
+    limit = 2 if shortest >= TYPO_LONG_WORD else 1
+    return _edit_distance(a, b, limit) <= limit
+
+
+def words_agree(query_words, entry_words):
+    # Cada palavra da pergunta precisa de uma correspondente na entrada, e
+    # vice-versa (em qualquer ordem).
+    if not query_words or len(query_words) != len(entry_words):
+        return False
+    remaining = list(entry_words)
+    for word in query_words:
+        for index, candidate in enumerate(remaining):
+            if _same_word(word, candidate):
+                del remaining[index]
+                break
+        else:
+            return False
+    return True
+
+
+class FaqEntry:
+    __slots__ = ("question", "answer", "featured", "normalized", "key_words")
+
+    def __init__(self, question, answer, featured=False):
+        self.question = question
+        self.answer = answer
+        self.featured = featured
+        self.normalized = normalize_text(question)
+        self.key_words = key_words(self.normalized)
+
+
+class FaqMatch:
+    __slots__ = ("entry", "tier", "score")
+
+    def __init__(self, entry, tier, score):
+        self.entry = entry
+        self.tier = tier
+        self.score = score
+
+    @property
+    def question(self):
+        return self.entry.question
+
+    @property
+    def answer(self):
+        return self.entry.answer
+
+
+def _trigrams(normalized):
+    padded = f"  {normalized} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class FaqMatcher:
+    def __init__(self, entries, embedder=None):
+        self.entries = entries
+        self.by_normalized = {}
+        for entry in entries:
+            self.by_normalized.setdefault(entry.normalized, entry)
+
+        self.trigram_sizes = []
+        self.trigram_postings = {}
+        for entry_id, entry in enumerate(entries):
+            grams = _trigrams(entry.normalized)
+            self.trigram_sizes.append(len(grams))
+            for gram in grams:
+                self.trigram_postings.setdefault(gram, []).append(entry_id)
+
+        self.embedder = embedder
+        self._vectors = None
+        self._vectors_lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path=FAQ_PATH):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        entries = [FaqEntry(item["question"], item["answer"], item.get("featured", False)) for item in data]
+        return cls(entries)
+
+    def featured(self, limit=MAX_FEATURED):
+        featured = [entry for entry in self.entries if entry.featured] or self.entries
+        return featured[:limit]
+
+    def _fuzzy(self, normalized):
+        grams = _trigrams(normalized)
+        overlap = Counter()
+        for gram in grams:
+            overlap.update(self.trigram_postings.get(gram, ()))
+        if not overlap:
+            return None
+        # Coeficiente de Dice sobre os trigramas escolhe os candidatos; o
+        # difflib (mais caro) só roda sobre os melhores.
+        candidates = heapq.nlargest(
+            FUZZY_CANDIDATES,
+            overlap,
+            key=lambda entry_id: 2 * overlap[entry_id] / (len(grams) + self.trigram_sizes[entry_id]),
+        )
+        scored = []
+        for entry_id in candidates:
+            entry = self.entries[entry_id]
+            scored.append((difflib.SequenceMatcher(None, normalized, entry.normalized).ratio(), entry_id))
+        query_words = key_words(normalized)
+        for score, entry_id in sorted(scored, reverse=True):
+            entry = self.entries[entry_id]
+            if words_agree(query_words, entry.key_words):
+                return FaqMatch(entry, "fuzzy", score)
+        return None
+
+    def _semantic(self, text):
+        import numpy as np
+
+        if self._vectors is None:
+            with self._vectors_lock:
+                if self._vectors is None:
+                    vectors = self.embedder.embed_documents([entry.question for entry in self.entries])
+                    self._vectors = np.asarray(vectors, dtype=np.float32)
+        if not len(self._vectors):
+            return None
+        scores = self._vectors @ np.asarray(self.embedder.embed_query(text), dtype=np.float32)
+        best = int(np.argmax(scores))
+        if scores[best] >= SEMANTIC_THRESHOLD:
+            return FaqMatch(self.entries[best], "semantic", float(scores[best]))
+        return None
+
+    def match(self, text):
+        normalized = normalize_text(text)
+        if not normalized:
+            return None
+        entry = self.by_normalized.get(normalized)
+        if entry is not None:
+            return FaqMatch(entry, "exact", 1.0)
+        found = self._fuzzy(normalized)
+        if found is None and self.embedder is not None:
+            found = self._semantic(text)
+        return found
+
+
+# --- INSTÂNCIA COMPARTILHADA POR PROCESSO ---
+
+_lock = threading.Lock()
+_state = {"key": None, "matcher": None}
+_stats = {"lookups": 0, "exact": 0, "fuzzy": 0, "semantic": 0, "misses": 0}
+
+
+def _file_key(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def get_matcher(path=FAQ_PATH):
+    key = _file_key(path)
+    if _state["key"] == key and _state["matcher"] is not None:
+        return _state["matcher"]
+    with _lock:
+        if _state["key"] != key or _state["matcher"] is None:
+            try:
+                matcher = FaqMatcher.from_file(path)
+            except Exception as e:
+                print(f"Erro ao carregar o FAQ '{path}': {e}")
+                matcher = FaqMatcher([])
+            if SEMANTIC_ENABLED:
+                try:
+                    from embeddings import get_embedder
+
+                    matcher.embedder = get_embedder()
+                except Exception as e:
+                    print(f"Aviso: correspondência semântica do FAQ desativada: {e}")
+            _state["key"] = key
+            _state["matcher"] = matcher
+    return _state["matcher"]
+
+
+def match(text):
+    found = get_matcher().match(text)
+    with _lock:
+        _stats["lookups"] += 1
+        _stats[found.tier if found else "misses"] += 1
+    return found
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats["hits"] = stats["exact"] + stats["fuzzy"] + stats["semantic"]
+    stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+    return stats
@@ -0,0 +1,92 @@
+import os
+from collections import OrderedDict
+
+import streamlit as st
+
+# --- HISTÓRICO DA CONVERSA EM JANELA ---
+# A cada interação o Streamlit reexecuta o script inteiro; desenhar todas as
+# mensagens da sessão fazia o tempo de cada clique crescer com o tamanho da
+# conversa. Aqui só as últimas EMI_HISTORY_WINDOW_TURNS perguntas (com suas
+# respostas) são desenhadas como balões. As anteriores ficam num arquivo
+# recolhido: só é montado quando o usuário o abre, e mesmo assim uma página
+# (EMI_HISTORY_PAGE_SIZE mensagens) por vez, num único bloco de markdown.
+# As páginas montadas ficam guardadas na sessão; como as mensagens só são
+# acrescentadas ao fim da lista, uma página já montada nunca muda.
+
+WINDOW_TURNS = int(os.environ.get("EMI_HISTORY_WINDOW_TURNS", "10"))
+PAGE_SIZE = int(os.environ.get("EMI_HISTORY_PAGE_SIZE", "20"))
+MAX_CACHED_PAGES = 20
+
+ARCHIVE_TOGGLE_KEY = "history_archive_open"
+ARCHIVE_PAGE_KEY = "history_archive_page"
+PAGE_CACHE_KEY = "history_page_cache"
+
+
+def window_start(messages, window_turns=WINDOW_TURNS):
+    # Índice da primeira mensagem da janela: começa na N-ésima pergunta do
+    # usuário contando do fim.
+    turns = 0
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index]["role"] == "user":
+            turns += 1
+            if turns == window_turns:
+                return index
+    return 0
+
+
+def _format_archived(message, labels):
+    return f"**{labels[message['role']]}:** {message['content']}"
+
+
+def page_markdown(messages, start, end, labels):
+    cache = st.session_state.setdefault(PAGE_CACHE_KEY, OrderedDict())
+    key = (start, end)
+    text = cache.get(key)
+    if text is None:
+        text = "\n\n---\n\n".join(_format_archived(message, labels) for message in messages[start:end])
+        cache[key] = text
+        while len(cache) > MAX_CACHED_PAGES:
+            cache.popitem(last=False)
+    else:
+        cache.move_to_end(key)
+    return text
+
+
+def _set_page(page):
+    st.session_state[ARCHIVE_PAGE_KEY] = page
+
+
+def render_archive(messages, archived, labels):
+    if not st.toggle(f"Mostrar mensagens anteriores ({archived})", key=ARCHIVE_TOGGLE_KEY):
+        return
+    pages = (archived + PAGE_SIZE - 1) // PAGE_SIZE
+    # As páginas são contadas a partir do início da conversa, para que novas
+    # mensagens não mudem as já montadas; por padrão abre a mais recente.
+    page = st.session_state.get(ARCHIVE_PAGE_KEY)
+    if page is None or page >= pages:
+        page = pages - 1
+    start = page * PAGE_SIZE
+    end = min(archived, start + PAGE_SIZE)
+
+    with st.container(border=True):
+        st.markdown(page_markdown(messages, start, end, labels))
+        previous_col, info_col, next_col = st.columns([1, 2, 1])
+        with previous_col:
+            st.button("← Anteriores", key="history_older", disabled=page == 0,
+                      on_click=_set_page, args=(page - 1,))
+        with info_col:
+            st.caption(f"Mensagens {start + 1}–{end} de {archived}")
+        with next_col:
+            st.button("Recentes →", key="history_newer", disabled=page >= pages - 1,
+                      on_click=_set_page, args=(page + 1,))
+
+
+def render_history(messages, avatars, labels):
+    # `avatars` e `labels` mapeiam o papel ("user"/"assistant") para o avatar
+    # do balão e o nome usado no arquivo.
+    archived = window_start(messages)
+    if archived:
+        render_archive(messages, archived, labels)
+    for message in messages[archived:]:
+        with st.chat_message(message["role"], avatar=avatars[message["role"]]):
+            st.markdown(message["content"])
@@ -0,0 +1,201 @@
+import argparse
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import documents
+import lexical_index
+import vector_index
+from assets import file_sha256
+from embeddings import get_embedder
+
+# --- INDEXADOR INCREMENTAL DO CORPUS ---
+# Mantém o índice vetorial em dia com a pasta de PDFs sem reprocessar tudo:
+#   * cada PDF é identificado pelo hash SHA-256 do conteúdo;
+#   * só arquivos novos ou alterados são extraídos (em paralelo, num pool de
+#     processos) e têm seus trechos fragmentados e embedados de novo;
+#   * trechos e vetores dos arquivos inalterados são reaproveitados do índice
+#     anterior, e os de arquivos removidos são descartados;
+#   * o índice lexical (BM25) é regravado sobre o conjunto final de trechos;
+#   * um PDF ilegível não interrompe a indexação: ele aparece como "erro" no
+#     relatório, mantém os trechos da versão anterior (se houver) e é tentado
+#     de novo na próxima execução.
+# O app (retrieval.py) só abre o índice pronto; ele nunca é construído lá.
+# Uso: python ingest.py [--embedder hashing] [--workers 8] [--full]
+
+
+def _extract(path, source):
+    # Roda num processo do pool: extração e fragmentação são CPU-bound. A
+    # falha de um arquivo volta como mensagem, para não derrubar o pool.map.
+    started = time.perf_counter()
+    try:
+        chunks = documents.load_chunks(path, source)
+    except Exception as e:
+        return None, time.perf_counter() - started, f"{type(e).__name__}: {e}"
+    return chunks, time.perf_counter() - started, None
+
+
+def fingerprint_files(pdf_dir, previous_files):
+    # Evita reler arquivos cujo tamanho e mtime não mudaram desde a última
+    # indexação; nos demais, o hash do conteúdo decide se houve alteração.
+    fingerprints = {}
+    for path in documents.list_pdfs(pdf_dir):
+        source = documents.source_name(path, pdf_dir)
+        stat = os.stat(path)
+        previous = previous_files.get(source)
+        if previous and previous.get("size") == stat.st_size and previous.get("mtime_ns") == stat.st_mtime_ns:
+            sha256 = previous["sha256"]
+        else:
+            sha256 = file_sha256(path)
+        fingerprints[source] = {"path": path, "sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return fingerprints
+
+
+def _load_previous(index_dir, embedder, full):
+    if full or not vector_index.exists(index_dir):
+        return None
+    try:
+        previous = vector_index.VectorIndex.load(index_dir)
+    except Exception as e:
+        print(f"Índice anterior ilegível ({e}); reconstruindo do zero.")
+        return None
+    if previous.embedder_name != embedder.name:
+        print(f"Embedder mudou ({previous.embedder_name} -> {embedder.name}); reconstruindo do zero.")
+        return None
+    return previous
+
+
+def update_index(pdf_dir=documents.PDF_DIR, index_dir=vector_index.INDEX_DIR, embedder=None,
+                 workers=None, full=False, verbose=True):
+    started_total = time.perf_counter()
+    embedder = embedder or get_embedder()
+    previous = _load_previous(index_dir, embedder, full)
+    previous_files = previous.files if previous else {}
+
+    fingerprints = fingerprint_files(pdf_dir, previous_files)
+    changed = [
+        source for source, fp in fingerprints.items()
+        if previous_files.get(source, {}).get("sha256") != fp["sha256"]
+    ]
+    removed = [source for source in previous_files if source not in fingerprints]
+    unchanged = [source for source in fingerprints if source not in changed]
+
+    report = {}
+    chunks_by_source = {}
+    failed = []
+    if changed:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            paths = [fingerprints[source]["path"] for source in changed]
+            for source, (chunks, elapsed, error) in zip(changed, pool.map(_extract, paths, changed)):
+                if error is not None:
+                    failed.append(source)
+                    report[source] = {"status": "erro", "chunks": previous_files.get(source, {}).get("chunks", 0),
+                                      "extract_s": elapsed, "error": error, "kept": source in previous_files}
+                    continue
+                chunks_by_source[source] = chunks
+                report[source] = {"status": "novo" if source not in previous_files else "alterado",
+                                  "chunks": len(chunks), "extract_s": elapsed}
+    changed = [source for source in changed if source not in failed]
+    # Arquivos com erro ficam com a versão anterior já indexada, se houver.
+    kept = unchanged + [source for source in failed if source in previous_files]
+
+    new_chunks = [chunk for source in changed for chunk in chunks_by_source[source]]
+    embed_started = time.perf_counter()
+    new_vectors = embedder.embed_documents([chunk["text"] for chunk in new_chunks]) if new_chunks else []
+    embed_elapsed = time.perf_counter() - embed_started
+    for source in changed:
+        # O tempo de embedding é feito em lote; atribui a cada arquivo a sua fração.
+        share = len(chunks_by_source[source]) / len(new_chunks) if new_chunks else 0
+        report[source]["embed_s"] = embed_elapsed * share
+
+    # Monta o novo índice: trechos reaproveitados + trechos novos.
+    chunks, vector_blocks = [], []
+    if previous is not None and kept:
+        kept_set = set(kept)
+        keep = [i for i, chunk in enumerate(previous.chunks) if chunk["source"] in kept_set]
+        chunks.extend(previous.chunks[i] for i in keep)
+        vector_blocks.append(np.asarray(previous.vectors[keep], dtype=np.float32))
+        for source in unchanged:
+            report[source] = {"status": "inalterado", "chunks": previous_files[source]["chunks"]}
+    chunks.extend(new_chunks)
+    if new_vectors:
+        vector_blocks.append(np.asarray(new_vectors, dtype=np.float32))
+    dim = vector_blocks[0].shape[1] if vector_blocks else 0
+    vectors = np.concatenate(vector_blocks) if vector_blocks else np.zeros((0, dim), dtype=np.float32)
+
+    files = {}
+    for source, fp in fingerprints.items():
+        if source in failed:
+            # Guarda o hash antigo (ou nada, se o arquivo é novo): assim a
+            # próxima execução vê o arquivo como alterado e tenta de novo.
+            if source in previous_files:
+                files[source] = previous_files[source]
+            continue
+        files[source] = {
+            "sha256": fp["sha256"],
+            "size": fp["size"],
+            "mtime_ns": fp["mtime_ns"],
+            "chunks": report[source]["chunks"],
+        }
+    for source in removed:
+        report[source] = {"status": "removido", "chunks": 0}
+
+    if files != previous_files or previous is None or not lexical_index.is_current(index_dir):
+        # Libera o memory-map do índice anterior antes de substituir os arquivos.
+        previous = None
+        # O índice lexical é gravado antes: o meta.json do vetorial, gravado por
+        # último, é o sinal para o app reabrir os dois. Os dois levam a mesma
+        # geração, e o app só combina índices da mesma geração.
+        generation = uuid.uuid4().hex
+        started = time.perf_counter()
+        lexical_index.LexicalIndex.build([chunk["text"] for chunk in chunks], generation).save(index_dir)
+        if verbose:
+            print(f"Índice lexical (BM25): {len(chunks)} trechos em {time.perf_counter() - started:.2f} s")
+        index = vector_index.VectorIndex(chunks, vectors, embedder.name, files, generation)
+        index.save(index_dir)
+    else:
+        index = previous
+
+    if verbose:
+        print_report(report, time.perf_counter() - started_total, index_dir)
+    return index, report
+
+
+def print_report(report, total_elapsed, index_dir):
+    for source in sorted(report):
+        item = report[source]
+        timings = ""
+        if "error" in item:
+            kept = " (mantida a versão anterior)" if item["kept"] else ""
+            timings = f"{kept} extração {item['extract_s']:.2f} s: {item['error']}"
+        elif "extract_s" in item:
+            timings = f" extração {item['extract_s']:.2f} s, embedding {item['embed_s']:.2f} s"
+        print(f"[{item['status']:>10}] {source}: {item['chunks']} trechos{timings}")
+    counts = {}
+    for item in report.values():
+        counts[item["status"]] = counts.get(item["status"], 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in sorted(counts.items())) or "nenhum PDF"
+    print(f"{summary}. Índice em {index_dir} atualizado em {total_elapsed:.2f} s.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Indexa (incrementalmente) os PDFs de governança do CHAT EMI.")
+    parser.add_argument("--embedder", help="gemini, hashing ou hashing-<dim> (padrão: EMI_EMBEDDER).")
+    parser.add_argument("--pdf-dir", default=documents.PDF_DIR)
+    parser.add_argument("--index-dir", default=vector_index.INDEX_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Processos de extração em paralelo (padrão: número de CPUs).")
+    parser.add_argument("--full", action="store_true", help="Ignora o índice existente e reprocessa tudo.")
+    args = parser.parse_args(argv)
+    _, report = update_index(args.pdf_dir, args.index_dir, get_embedder(args.embedder),
+                             workers=args.workers, full=args.full)
+    # O índice é gravado mesmo assim; o código de saída avisa que faltou algum PDF.
+    return 1 if any(item["status"] == "erro" for item in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,239 @@
+import argparse
+import json
+import os
+import re
+import sys
+from collections import Counter
+
+import numpy as np
+
+import vector_index
+from text_utils import STOPWORDS, fold_accents, words
+
+# --- ÍNDICE LEXICAL (BM25) ---
+# Índice invertido sobre os mesmos trechos do índice vetorial, para perguntas
+# que dependem de termos exatos ("Art. 18", "Canal de Denúncias",
+# "conflito de interesses"). Os termos passam por minúsculas, remoção de
+# acentos, stopwords e um stemmer leve de português.
+#
+# Formato em disco (no diretório do índice, ao lado do índice vetorial):
+#   lexical.json          -> termos (ordenados), df e offset de cada termo
+#   lexical_docs.npy      -> uint32: ids dos trechos, postings concatenados
+#   lexical_tfs.npy       -> uint16: frequência do termo em cada posting
+#   lexical_lengths.npy   -> uint32: tamanho (em termos) de cada trecho
+# Os arrays são abertos com memory-map, então carregar o índice leva poucos
+# milissegundos mesmo com um corpus grande.
+#
+# Também funciona sozinho, sem chamar o modelo:
+#   python lexical_index.py "Canal de Denúncias"
+
+LEXICAL_VERSION = 2
+META_FILE = "lexical.json"
+DOCS_FILE = "lexical_docs.npy"
+TFS_FILE = "lexical_tfs.npy"
+LENGTHS_FILE = "lexical_lengths.npy"
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Sufixos removidos pelo stemmer, do mais longo para o mais curto. Baseado nas
+# etapas do RSLP (plural, sufixos nominais, verbais e vogal final), bem
+# simplificado.
+_PLURAL_RULES = (("oes", "ao"), ("aes", "ao"), ("ais", "al"), ("eis", "el"), ("ois", "ol"), ("ns", "m"), ("res", "r"))
+_SUFFIXES = (
+    "amentos", "imentos", "amento", "imento", "adoras", "izacao", "acoes", "icoes",
+    "mente", "acao", "icao", "ancia", "encia", "idade", "ismos", "istas", "adora", "ador",
+    "avel", "ivel", "ismo", "ista", "osos", "osas", "oso", "osa", "ivo", "iva",
+    "ando", "endo", "indo", "aram", "eram", "iram", "ados", "adas", "idos", "idas",
+    "ado", "ada", "ido", "ida", "ar", "er", "ir",
+)
+_MIN_STEM = 3
+
+
+def stem(word):
+    if word.isdigit() or len(word) <= _MIN_STEM:
+        return word
+    for suffix, replacement in _PLURAL_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            word = word[:-len(suffix)] + replacement
+            break
+    else:
+        if word.endswith("s") and not word.endswith(("ss", "us")) and len(word) > _MIN_STEM + 1:
+            word = word[:-1]
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[:-len(suffix)]
+    if word[-1] in "aeo" and len(word) > _MIN_STEM + 1:
+        return word[:-1]
+    return word
+
+
+_ARTICLE_WORDS = ("art", "artigo", "artigos", "arts")
+
+
+def tokenize(text):
+    raw = words(text)
+    tokens = [stem(w) for w in raw if w not in STOPWORDS]
+    # "Art. 18" vira também o termo "art18", para que o número do artigo não se
+    # confunda com qualquer outro "18" do texto.
+    tokens.extend(f"art{number}" for word, number in zip(raw, raw[1:]) if word in _ARTICLE_WORDS and number.isdigit())
+    return tokens
+
+
+class LexicalIndex:
+    def __init__(self, terms, offsets, dfs, doc_ids, tfs, lengths, generation=None):
+        self.terms = terms
+        self.offsets = offsets
+        self.dfs = dfs
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.lengths = lengths
+        self.n_docs = len(lengths)
+        self.avg_length = float(np.mean(lengths)) if self.n_docs else 0.0
+        self._term_ids = {term: i for i, term in enumerate(terms)}
+        # Mesmo id do meta.json do índice vetorial gravado junto (ver ingest.py).
+        self.generation = generation
+
+    @classmethod
+    def build(cls, texts, generation=None):
+        postings = {}
+        lengths = np.zeros(len(texts), dtype=np.uint32)
+        for doc_id, text in enumerate(texts):
+            counts = Counter(tokenize(text))
+            lengths[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc_id, min(tf, 65535)))
+
+        terms = sorted(postings)
+        offsets, dfs = [], []
+        doc_ids, tfs = [], []
+        for term in terms:
+            offsets.append(len(doc_ids))
+            dfs.append(len(postings[term]))
+            for doc_id, tf in postings[term]:
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+        return cls(
+            terms, offsets, dfs,
+            np.asarray(doc_ids, dtype=np.uint32), np.asarray(tfs, dtype=np.uint16), lengths, generation,
+        )
+
+    def scores(self, query):
+        # Vetor com o score BM25 de cada trecho (0 para os que não contêm termos da consulta).
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        if not self.n_docs:
+            return scores
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths / (self.avg_length or 1.0))
+        for term in set(tokenize(query)):
+            term_id = self._term_ids.get(term)
+            if term_id is None:
+                continue
+            start, df = self.offsets[term_id], self.dfs[term_id]
+            ids = self.doc_ids[start:start + df]
+            tf = self.tfs[start:start + df].astype(np.float32)
+            idf = np.log(1 + (self.n_docs - df + 0.5) / (df + 0.5))
+            scores[ids] += idf * tf * (BM25_K1 + 1) / (tf + norm[ids])
+        return scores
+
+    def search(self, query, k=10):
+        scores = self.scores(query)
+        hits = np.flatnonzero(scores)
+        hits = hits[np.argsort(-scores[hits])][:k]
+        return [(int(i), float(scores[i])) for i in hits]
+
+    def save(self, index_dir=vector_index.INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        arrays = {DOCS_FILE: self.doc_ids, TFS_FILE: self.tfs, LENGTHS_FILE: self.lengths}
+        for name, array in arrays.items():
+            with open(os.path.join(index_dir, name + ".tmp"), "wb") as f:
+                np.save(f, array)
+        meta = {
+            "version": LEXICAL_VERSION,
+            "n_docs": self.n_docs,
+            "terms": self.terms,
+            "offsets": self.offsets,
+            "dfs": self.dfs,
+            "generation": self.generation,
+        }
+        with open(os.path.join(index_dir, META_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, separators=(",", ":"))
+        for name in (*arrays, META_FILE):
+            os.replace(os.path.join(index_dir, name + ".tmp"), os.path.join(index_dir, name))
+
+    @classmethod
+    def load(cls, index_dir=vector_index.INDEX_DIR):
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != LEXICAL_VERSION:
+            raise ValueError(f"Índice lexical em '{index_dir}' tem versão incompatível; rode ingest.py --full.")
+        arrays = [np.load(os.path.join(index_dir, name), mmap_mode="r") for name in (DOCS_FILE, TFS_FILE, LENGTHS_FILE)]
+        return cls(meta["terms"], meta["offsets"], meta["dfs"], *arrays, meta.get("generation"))
+
+
+def exists(index_dir=vector_index.INDEX_DIR):
+    return os.path.exists(os.path.join(index_dir, META_FILE))
+
+
+def is_current(index_dir=vector_index.INDEX_DIR):
+    # Falso se o índice não existe ou foi gravado por outra versão (ex.: com
+    # outro stemmer), caso em que o ingest.py precisa reconstruí-lo.
+    try:
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            return json.load(f).get("version") == LEXICAL_VERSION
+    except (OSError, ValueError):
+        return False
+
+
+def hybrid_scores(vector_scores, lexical_scores, alpha=0.5):
+    # Combina as duas listas de scores normalizando cada uma pelo seu máximo.
+    # alpha=1 usa só o vetorial; alpha=0, só o BM25.
+    combined = np.zeros(len(vector_scores), dtype=np.float32)
+    for weight, scores in ((alpha, vector_scores), (1 - alpha, lexical_scores)):
+        if weight and len(scores):
+            top = float(np.max(scores))
+            if top > 0:
+                combined += weight * np.clip(np.asarray(scores, dtype=np.float32), 0, None) / top
+    return combined
+
+
+def snippet(text, query, width=160):
+    # Trecho de texto ao redor da primeira ocorrência de um termo da consulta.
+    folded = fold_accents(text.lower())
+    positions = []
+    for term in set(tokenize(query)):
+        match = re.search(r"\b" + re.escape(term), folded)
+        if match:
+            positions.append(match.start())
+    center = min(positions) if positions else 0
+    start = max(0, center - width // 2)
+    prefix = "…" if start else ""
+    suffix = "…" if start + width < len(text) else ""
+    return prefix + text[start:start + width] + suffix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Busca onde um termo aparece nos documentos, sem chamar o modelo.")
+    parser.add_argument("query")
+    parser.add_argument("-k", type=int, default=10, help="Quantidade de resultados (padrão: 10).")
+    parser.add_argument("--index-dir", default=vector_index.INDEX_DIR)
+    args = parser.parse_args(argv)
+
+    if not exists(args.index_dir):
+        print(f"Índice lexical não encontrado em '{args.index_dir}'. Rode `python ingest.py`.")
+        return 1
+    index = LexicalIndex.load(args.index_dir)
+    with open(os.path.join(args.index_dir, vector_index.CHUNKS_FILE), encoding="utf-8") as f:
+        chunks = [json.loads(line) for line in f if line.strip()]
+
+    hits = index.search(args.query, args.k)
+    if not hits:
+        print("Nenhuma ocorrência encontrada.")
+    for doc_id, score in hits:
+        chunk = chunks[doc_id]
+        print(f"{chunk['source']}, p. {chunk['page']} (score {score:.2f})")
+        print(f"    {snippet(chunk['text'], args.query)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,121 @@
+import os
+import sys
+import threading
+
+# --- CLIENTE GEMINI COMPARTILHADO POR PROCESSO ---
+# genai.configure() recria o cliente gRPC; chamá-lo a cada pergunta descartava
+# a conexão já aberta. Aqui o SDK é configurado e o modelo é criado uma única
+# vez por processo, e o mesmo objeto é compartilhado entre as threads das
+# sessões do Streamlit (GenerativeModel não guarda estado de conversa; cada
+# pergunta abre seu próprio ChatSession).
+#
+# Importar o SDK leva quase um segundo e a maioria das execuções (abrir a
+# página, clicar numa FAQ, resposta em cache) não fala com o modelo. Por isso
+# o google.generativeai só é importado na primeira chamada; no modo de início
+# rápido (EMI_FAST_START, padrão) também não há aquecimento na abertura, e o
+# SDK carrega na primeira pergunta digitada.
+
+MODEL_NAME = os.environ.get("EMI_MODEL_NAME", "gemini-1.5-flash-latest")
+REQUEST_TIMEOUT_S = float(os.environ.get("EMI_REQUEST_TIMEOUT", "60"))
+RETRY_INITIAL_S = float(os.environ.get("EMI_RETRY_INITIAL", "1.0"))
+RETRY_MAX_S = float(os.environ.get("EMI_RETRY_MAX", "10.0"))
+RETRY_MULTIPLIER = float(os.environ.get("EMI_RETRY_MULTIPLIER", "2.0"))
+RETRY_DEADLINE_S = float(os.environ.get("EMI_RETRY_DEADLINE", "60"))
+FAST_START = os.environ.get("EMI_FAST_START", "1") != "0"
+WARM_UP = os.environ.get("EMI_WARM_UP", "0" if FAST_START else "1") != "0"
+
+_lock = threading.Lock()
+_state = {"api_key": None, "models": {}, "warm_up_started": False}
+
+
+def _genai():
+    import google.generativeai as genai
+    return genai
+
+
+def _retryable():
+    from google.api_core import exceptions as google_exceptions
+
+    # Erros de cota (ResourceExhausted) ficam de fora: quem trata é o
+    # scheduler.with_backoff, que também reduz a concorrência do processo.
+    return (
+        google_exceptions.ServiceUnavailable,
+        google_exceptions.DeadlineExceeded,
+        google_exceptions.InternalServerError,
+    )
+
+
+def sdk_loaded():
+    return "google.generativeai" in sys.modules
+
+
+def _configure(api_key):
+    # Chamado com o lock adquirido.
+    if _state["api_key"] != api_key:
+        _genai().configure(api_key=api_key)
+        _state["api_key"] = api_key
+        _state["models"].clear()
+
+
+def configure(api_key):
+    if _state["api_key"] == api_key:
+        return
+    with _lock:
+        _configure(api_key)
+
+
+def get_model(api_key, model_name=None):
+    model_name = model_name or MODEL_NAME
+    model = _state["models"].get(model_name)
+    if model is not None and _state["api_key"] == api_key:
+        return model
+    with _lock:
+        _configure(api_key)
+        model = _state["models"].get(model_name)
+        if model is None:
+            model = _genai().GenerativeModel(model_name)
+            _state["models"][model_name] = model
+        return model
+
+
+def retry_policy():
+    # Usada nas chamadas completas e na abertura dos streams (até o primeiro
+    # pedaço, ver backends.GeminiBackend.stream).
+    from google.api_core import retry as google_retry
+
+    return google_retry.Retry(
+        predicate=google_retry.if_exception_type(*_retryable()),
+        initial=RETRY_INITIAL_S,
+        maximum=RETRY_MAX_S,
+        multiplier=RETRY_MULTIPLIER,
+        timeout=RETRY_DEADLINE_S,
+    )
+
+
+def request_options(stream=False):
+    # Um stream já iniciado não pode ser repetido com segurança: nele o retry
+    # fica a cargo de quem o abre, e só até o primeiro pedaço.
+    options = {"timeout": REQUEST_TIMEOUT_S}
+    if not stream:
+        options["retry"] = retry_policy()
+    return options
+
+
+def warm_up(api_key, model_name=None):
+    # Abre o canal com a API (count_tokens é barato e não gera texto) para
+    # que o primeiro usuário não pague o custo de conexão.
+    try:
+        model = get_model(api_key, model_name)
+        model.count_tokens("ping", request_options={"timeout": REQUEST_TIMEOUT_S})
+    except Exception as e:
+        print(f"Aviso: falha ao aquecer o cliente Gemini: {e}")
+
+
+def warm_up_async(api_key, model_name=None):
+    if not WARM_UP or not api_key:
+        return
+    with _lock:
+        if _state["warm_up_started"]:
+            return
+        _state["warm_up_started"] = True
+    threading.Thread(target=warm_up, args=(api_key, model_name), name="gemini-warm-up", daemon=True).start()
@@ -1,11 +1,34 @@
+import time
+# Marcado antes de qualquer import: na primeira execução do processo, o
+# tempo de importação dos módulos entra na conta (etapa "imports").
+SCRIPT_STARTED = time.perf_counter()
 import os
-import google.generativeai as genai
+import uuid
 import streamlit as st
 from dotenv import load_dotenv
-import base64
 
 # --- CRITICAL: ALL IMPORTS AND NON-STREAMLIT CONFIGURATION FIRST ---
+# Antes dos módulos do app: eles leem as configurações EMI_* na importação,
+# então o .env precisa já estar carregado.
 load_dotenv() # Carrega as variáveis de ambiente (como GEMINI_API_KEY)
+import assets
+import backends
+import chat_pipeline
+import context
+import conversation_store
+import faq
+import history_view
+import llm_client
+import metrics
+import page_shell
+import response_cache
+import scheduler
+import single_flight
+import streaming
+
+# Tempos das etapas desta execução do script (ver metrics.py).
+run_metrics = metrics.Run(started=SCRIPT_STARTED)
+run_metrics.mark("imports")
 
 # --- CONFIGURAÇÕES DA PÁGINA ---
 ASSISTANT_NAME = "CHAT EMI"
@@ -20,32 +43,18 @@ LOGO_NCTECH_FOOTER_PATH = "logo_nctech.png"
 LOGO_GRUPONC_FOOTER_PATH = "logo_gruponc.png"
 
 # --- Perguntas e Respostas Fixas (FAQs) ---
-FAQ_QUESTIONS_ANSWERS = {
-    "Qual é o código de ética da EMS?": "O Código de Ética da EMS estabelece os princípios e valores que devem guiar a conduta de todos os colaboradores, parceiros e fornecedores, visando a integridade, transparência e responsabilidade social. Ele aborda temas como combate à corrupção, conflito de interesses e proteção de informações confidenciais.",
-    "Como faço para denunciar uma conduta indevida?": "Denúncias de conduta indevida podem ser feitas através do Canal de Denúncias da EMS, disponível no site oficial da empresa ou por telefone. As denúncias podem ser anônimas e são tratadas com confidencialidade para garantir a segurança do denunciante.",
-    "Quais são as políticas de compliance da EMS?": "As políticas de compliance da EMS englobam diversas diretrizes para assegurar que a empresa atue em conformidade com as leis, regulamentos e padrões éticos. Isso inclui políticas anticorrupção, de privacidade de dados, de concorrência leal e de segurança do trabalho.",
-    "Onde posso encontrar o manual de conduta?": "O manual de conduta está disponível na intranet da EMS, na seção de 'Documentos Corporativos'. Caso não tenha acesso, entre em contato com o departamento de Recursos Humanos ou Compliance para obter uma cópia."
-}
-
-def get_image_data_uri_safe(image_path, fallback_value):
-    if not os.path.exists(image_path):
-        return fallback_value
-    try:
-        with open(image_path, "rb") as img_file:
-            encoded = base64.b64encode(img_file.read()).decode()
-            return f"data:image/png;base64,{encoded}"
-    except Exception as e:
-        print(f"Erro ao carregar a imagem '{image_path}': {e}")
-        return fallback_value
+# Carregadas de faqs.json (ver faq.py); os botões mostram as perguntas em destaque.
+
+def get_image_data_uri_safe(image_path, fallback_value, formats=None):
+    # Lido e codificado uma única vez por processo (ver assets.py). Se o
+    # build_assets.py já rodou, usa a versão no tamanho de exibição.
+    with run_metrics.stage("asset_load"):
+        return assets.get_display_data_uri(image_path, fallback_value, formats)
 
 assistant_avatar_data_uri = get_image_data_uri_safe(ASSISTANT_AVATAR_IMAGE_PATH, None)
-logo_emi_data_uri = get_image_data_uri_safe(LOGO_EMI_PATH, None)
-logo_ems_footer_data_uri = get_image_data_uri_safe(LOGO_EMS_FOOTER_PATH, None)
-logo_nctech_footer_data_uri = get_image_data_uri_safe(LOGO_NCTECH_FOOTER_PATH, None)
-logo_gruponc_footer_data_uri = get_image_data_uri_safe(LOGO_GRUPONC_FOOTER_PATH, None)
 
 if assistant_avatar_data_uri:
-    ASSISTANT_PAGE_ICON = assistant_avatar_data_uri
+    ASSISTANT_PAGE_ICON = get_image_data_uri_safe(ASSISTANT_AVATAR_IMAGE_PATH, None, formats=("png",))
 else:
     ASSISTANT_PAGE_ICON = "🌍"
 
@@ -57,22 +66,22 @@ st.set_page_config(
 )
 
 if assistant_avatar_data_uri:
-    ASSISTANT_CHAT_AVATAR = assistant_avatar_data_uri
+    # Caminho do arquivo: cada balão leva só a URL do avatar, não a imagem em base64.
+    ASSISTANT_CHAT_AVATAR = assets.get_display_path(ASSISTANT_AVATAR_IMAGE_PATH, assistant_avatar_data_uri)
 else:
     ASSISTANT_CHAT_AVATAR = "🌍"
     st.warning(f"A imagem do avatar do assistente '{ASSISTANT_AVATAR_IMAGE_PATH}' não foi encontrada. Usando emoji padrão.")
 
-def get_base64_for_html(data_uri, path_name):
-    if data_uri:
-        return data_uri.split(',')[1]
-    else:
+def get_src_for_html(path_name):
+    data_uri = get_image_data_uri_safe(path_name, "")
+    if not data_uri:
         st.warning(f"A imagem da logo '{path_name}' não foi encontrada. O logo pode não aparecer.")
-        return ""
+    return data_uri
 
-logo_emi_base64_for_html = get_base64_for_html(logo_emi_data_uri, LOGO_EMI_PATH)
-logo_ems_footer_base64_for_html = get_base64_for_html(logo_ems_footer_data_uri, LOGO_EMS_FOOTER_PATH)
-logo_nctech_footer_base64_for_html = get_base64_for_html(logo_nctech_footer_data_uri, LOGO_NCTECH_FOOTER_PATH)
-logo_gruponc_footer_base64_for_html = get_base64_for_html(logo_gruponc_footer_data_uri, LOGO_GRUPONC_FOOTER_PATH)
+logo_emi_src_for_html = get_src_for_html(LOGO_EMI_PATH)
+logo_ems_footer_src_for_html = get_src_for_html(LOGO_EMS_FOOTER_PATH)
+logo_nctech_footer_src_for_html = get_src_for_html(LOGO_NCTECH_FOOTER_PATH)
+logo_gruponc_footer_src_for_html = get_src_for_html(LOGO_GRUPONC_FOOTER_PATH)
 
 def get_api_key():
     api_key = os.environ.get("GEMINI_API_KEY")
@@ -81,322 +90,94 @@ def get_api_key():
         st.stop()
     return api_key
 
-def set_background(image_path):
-    if not os.path.exists(image_path):
+# Aquece o cliente Gemini em segundo plano, uma única vez por processo. No
+# modo de início rápido (EMI_FAST_START, padrão) não há aquecimento: o SDK
+# só é importado na primeira pergunta digitada (ver llm_client.py).
+if backends.requires_api_key():
+    llm_client.warm_up_async(os.environ.get("GEMINI_API_KEY"))
+
+# Contadores dos módulos exportados junto com as latências (arquivo
+# Prometheus e, se configurado, endpoint /metrics), uma vez por processo.
+metrics.register_collector("assets", assets.get_stats)
+metrics.register_collector("faq", faq.get_stats)
+metrics.register_collector("response_cache", response_cache.get_stats)
+metrics.register_collector("single_flight", single_flight.get_stats)
+metrics.register_collector("scheduler", scheduler.get_stats)
+metrics.register_collector("conversations", conversation_store.get_stats)
+metrics.register_collector("page_shell", page_shell.get_stats)
+metrics.start_exporters()
+
+def apply_page_style(image_path):
+    # Fundo e CSS do app num único bloco, montado uma vez por processo (ver page_shell.py).
+    background_data_uri = get_image_data_uri_safe(image_path, None)
+    if not background_data_uri:
         st.warning(f"A imagem de fundo '{image_path}' não foi encontrada. O fundo padrão será usado.")
-        return
-    with open(image_path, "rb") as img_file:
-        encoded = base64.b64encode(img_file.read()).decode()
-    css = f"""
-    <style>
-    .stApp {{
-        background-image: url("data:image/png;base64,{encoded}");
-        background-size: cover;
-        background-repeat: no-repeat;
-        background-attachment: fixed;
-        background-position: center;
-    }}
-    </style>
-    """
-    st.markdown(css, unsafe_allow_html=True)
-
-def apply_custom_css():
-    st.markdown("""
-        <style>
-        @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap');
-
-        body {
-            font-family: 'Roboto', sans-serif;
-            color: #333;
-        }
-
-        /* Container Principal do Chat - Agora transparente */
-        .block-container {
-            max-width: 700px !important;
-            padding: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
-            background-color: rgba(255, 255, 255, 0.7) !important;
-            border-radius: 16px !important;
-            box-shadow: 0 10px 40px 0 rgba(0, 86, 145, 0.15) !important;
-            backdrop-filter: blur(8px) !important;
-            -webkit-backdrop-filter: blur(8px) !important;
-            border: 1px solid rgba(0, 86, 145, 0.1) !important;
-            margin-top: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
-            margin-bottom: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
-        }
-
-        /* Títulos */
-        h2 {
-            color: #005691 !important;
-            text-align: center !important;
-            font-weight: 700 !important;
-            margin-bottom: 0.5rem !important;
-            letter-spacing: -0.5px !important;
-        }
-        p.subheader {
-            color: #005691 !important;
-            text-align: center !important;
-            margin-bottom: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
-            font-weight: 400 !important;
-            font-size: 1.1em !important;
-            opacity: 0.9 !important;
-        }
-
-        /* Balões de Mensagem - Fundos mais transparentes */
-        .stChatMessage {
-            border-radius: 12px !important;
-            padding: 16px 20px !important;
-            margin-bottom: 10px !important; /* REDUZIDO: de 15px para 10px */
-            box-shadow: 0 4px 15px rgba(0,86,145,0.1) !important;
-            border: none !important;
-            word-wrap: break-word !important;
-            line-height: 1.6 !important;
-        }
-
-        /* Mensagem do Assistente - Azul claro transparente */
-        div[data-testid="stChatMessage"]:has(div.stMarkdown) div.stMarkdown {
-            background-color: rgba(224, 242, 247, 0.85) !important;
-            color: #263238 !important;
-            border-radius: 12px !important;
-            padding: 16px 20px !important;
-            border-left: 5px solid #005691 !important;
-            padding-left: 25px !important;
-        }
-
-        /* Mensagem do Usuário - Branco transparente */
-        div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-user"]) div.stMarkdown {
-            background-color: rgba(255, 255, 255, 0.85) !important;
-            color: #263238 !important;
-            border: 1px solid rgba(0, 86, 145, 0.2) !important;
-            border-radius: 12px !important;
-            padding: 16px 20px !important;
-        }
-
-        /* Área de Input - Totalmente transparente */
-        .stChatInputContainer {
-            background-color: transparent !important;
-            border-top: 1px solid rgba(0, 86, 145, 0.1) !important;
-            padding-top: 1rem !important; /* REDUZIDO: de 1.5rem para 1rem */
-            margin-top: 0.5rem !important; /* REDUZIDO: de 1rem para 0.5rem */
-        }
-
-        /* Campo de Input - Fundo transparente */
-        .stTextInput > div > div > input {
-            border-radius: 25px !important;
-            padding: 12px 20px !important;
-            border: 1px solid #005691 !important;
-            background-color: rgba(255, 255, 255, 0.8) !important;
-            box-shadow: 0 2px 8px rgba(0,86,145,0.1) !important;
-            font-size: 1.05em !important;
-            color: #333 !important;
-        }
-
-        /* Botão de enviar - Mantém o azul EMS */
-        button[title="Send"] {
-            background-color: #005691 !important;
-            color: white !important;
-            border-radius: 50% !important;
-            width: 45px !important;
-            height: 45px !important;
-            display: flex !important;
-            align-items: center !important;
-            justify-content: center !important;
-            box-shadow: 0 4px 10px rgba(0,86,145,0.2) !important;
-            transition: background-color 0.3s ease !important;
-        }
-
-        button[title="Send"]:hover {
-            background-color: #003F6E !important;
-        }
-        .header-container {
-            text-align: center;
-            margin-bottom: 0.5rem; /* REDUZIDO: de 1rem para 0.5rem */
-            padding-top: 0.5rem; /* REDUZIDO: de 1rem para 0.5rem */
-            background-color: transparent !important;
-        }
-
-        .main-logo {
-            width: 280px; /* REDUZIDO: de 350px para 280px */
-            height: auto;
-            margin-bottom: 5px; /* REDUZIDO: de 10px para 5px */
-        }
-
-        /* ESTA É A PARTE CHAVE PARA AUMENTAR O TAMANHO DO AVATAR NO CHAT! */
-        /* Seleciona a imagem dentro do span do avatar do chat e força o tamanho */
-        div[data-testid="stChatMessage"] span[data-testid^="chatAvatarIcon-"] img {
-            width: 70px !important; /* REDUZIDO: de 90px para 70px */
-            height: 70px !important; /* REDUZIDO: de 90px para 70px */
-            object-fit: cover;
-            border-radius: 50%;
-        }
-
-        div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-assistant"]),
-        div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-user"]) {
-            background-color: transparent !important;
-        }
-
-        .stChatMessage p {
-            color: inherit !important;
-            margin-bottom: 0 !important;
-        }
-
-        /* Ajustes finos para Streamlit - pode remover se causar problemas */
-        div.css-fg4pbf,
-        div[data-testid="stVerticalBlock"] > div:first-child > div:nth-child(2) {
-            padding-top: 0.5rem !important; /* Ajustado */
-            padding-bottom: 0.5rem !important; /* Ajustado */
-        }
-
-        .main .block-container {
-            display: flex !important;
-            flex-direction: column !important;
-            align-items: center !important;
-            justify-content: center !important;
-        }
-
-        /* Estilo para a seção de FAQ */
-        .faq-section-title {
-            color: #005691 !important;
-            text-align: center !important;
-            font-weight: 700 !important;
-            margin-top: 1.5rem !important; /* REDUZIDO: de 2.5rem para 1.5rem */
-            margin-bottom: 0.5rem !important;
-            font-size: 1.6em !important; /* LIGEIRAMENTE REDUZIDO: de 1.8em para 1.6em */
-            letter-spacing: -0.5px !important;
-        }
-
-        .faq-section-description {
-            color: #555;
-            text-align: center;
-            margin-bottom: 1rem; /* REDUZIDO: de 1.5rem para 1rem */
-            font-size: 0.95em; /* LIGEIRAMENTE REDUZIDO: de 1em para 0.95em */
-            line-height: 1.5;
-        }
-
-        .faq-grid-container {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(260px, 1fr)); /* REDUZIDO: minmax de 280px para 260px */
-            gap: 10px; /* REDUZIDO: de 15px para 10px */
-            margin-top: 15px; /* REDUZIDO: de 20px para 15px */
-            margin-bottom: 20px; /* REDUZIDO: de 30px para 20px */
-            width: 100%;
-            max-width: 650px;
-        }
-
-        /* NOVO ESTILO PARA OS BOTÕES DE FAQ - AGORA SIMULANDO OS CARTÕES */
-        .stButton > button {
-            background-color: rgba(255, 255, 255, 0.9) !important;
-            border: 1px solid #005691 !important;
-            border-radius: 12px !important;
-            padding: 12px 15px !important; /* REDUZIDO: de 15px 20px para 12px 15px */
-            cursor: pointer !important;
-            transition: all 0.3s ease !important;
-            box-shadow: 0 4px 12px rgba(0, 86, 145, 0.1) !important;
-            display: flex !important;
-            align-items: center !important;
-            justify-content: center !important;
-            text-align: center !important;
-            min-height: 70px !important; /* REDUZIDO: de 80px para 70px */
-            width: 100% !important;
-            color: #005691 !important;
-            font-weight: 500 !important;
-            font-size: 0.9em !important; /* LIGEIRAMENTE REDUZIDO: de 0.95em para 0.9em */
-            white-space: normal !important;
-            line-height: 1.4 !important;
-        }
-
-        .stButton > button:hover {
-            background-color: #005691 !important;
-            color: white !important;
-            transform: translateY(-3px) !important; /* EFEITO SUAVIZADO: de -5px para -3px */
-            box-shadow: 0 5px 15px rgba(0, 86, 145, 0.2) !important; /* SOMBRA SUAVIZADA */
-        }
-
-        /* Novo estilo para o rodapé de logos */
-        .footer-logos-container {
-            text-align: center;
-            margin-top: 2rem; /* REDUZIDO: de 3rem para 2rem */
-            padding-top: 1rem; /* REDUZIDO: de 1.5rem para 1rem */
-            border-top: 1px solid rgba(0, 86, 145, 0.1);
-            background-color: rgba(0, 0, 0, 0.1);
-            border-radius: 0 0 16px 16px;
-            padding-bottom: 0.8rem; /* REDUZIDO: de 1rem para 0.8rem */
-        }
-
-        .footer-logos-container p {
-            color: #005691;
-            font-size: 0.85em; /* LIGEIRAMENTE REDUZIDO: de 0.9em para 0.85em */
-            margin-bottom: 0.8rem; /* REDUZIDO: de 1rem para 0.8rem */
-            font-weight: 500;
-        }
-
-        .footer-logos {
-            display: flex;
-            justify-content: center;
-            align-items: center;
-            gap: 15px; /* REDUZIDO: de 20px para 15px */
-            flex-wrap: wrap;
-        }
-
-        .footer-logos img {
-            height: 35px; /* REDUZIDO: de 40px para 35px */
-            width: auto;
-            object-fit: contain;
-            filter: drop-shadow(0 2px 4px rgba(0,0,0,0.1)); /* SOMBRA SUAVIZADA */
-        }
-
-        </style>
-    """, unsafe_allow_html=True)
+    st.markdown(page_shell.style_html(background_data_uri), unsafe_allow_html=True)
 
 def main():
-    set_background(BACKGROUND_IMAGE_PATH)
-    apply_custom_css()
+    with run_metrics.stage("css"):
+        apply_page_style(BACKGROUND_IMAGE_PATH)
 
-    st.markdown(f"""
-        <div class="header-container">
-            <img src="data:image/png;base64,{logo_emi_base64_for_html}" class="main-logo">
-        </div>
-    """, unsafe_allow_html=True)
+    st.markdown(page_shell.header_html(logo_emi_src_for_html), unsafe_allow_html=True)
+    # Do início do script até o cabeçalho (imports, recursos e CSS) já enviado ao navegador.
+    run_metrics.mark("first_paint")
 
     if "messages" not in st.session_state:
-        st.session_state.messages = [
-            {"role": "assistant", "content": "Olá! Estou aqui para ajudar com suas dúvidas sobre governança na empresa EMS. Você pode digitar sua pergunta ou escolher uma das opções abaixo:"}
-        ]
+        # Retoma a conversa indicada na URL (?sessao=...) ou começa uma nova.
+        conversation = conversation_store.open_session(st.query_params.get("sessao"))
+        if not len(conversation):
+            conversation.append({"role": "assistant", "content": "Olá! Estou aqui para ajudar com suas dúvidas sobre governança na empresa EMS. Você pode digitar sua pergunta ou escolher uma das opções abaixo:", "source": "greeting"})
+        st.session_state.messages = conversation
+        st.session_state.session_id = conversation.session_id
+        st.query_params["sessao"] = conversation.session_id
+    if "context" not in st.session_state:
+        st.session_state.context = context.ConversationContext()
+    if "session_id" not in st.session_state:
+        st.session_state.session_id = uuid.uuid4().hex
+    conversation = st.session_state.messages
+    if getattr(conversation, "session_id", st.session_state.session_id) != st.session_state.session_id:
+        # A conversa foi separada numa sessão nova (outra aba na mesma URL).
+        st.session_state.session_id = conversation.session_id
+        st.query_params["sessao"] = conversation.session_id
 
     st.markdown("---")
     st.markdown("<h2 class='faq-section-title'>Perguntas Frequentes</h2>", unsafe_allow_html=True)
     st.markdown("<p class='faq-section-description'>Clique em uma das perguntas abaixo para obter uma resposta rápida:</p>", unsafe_allow_html=True)
     
+    featured_faqs = faq.get_matcher().featured()
     num_cols = 2
-    effective_num_cols = min(num_cols, len(FAQ_QUESTIONS_ANSWERS)) if len(FAQ_QUESTIONS_ANSWERS) > 0 else 1
+    effective_num_cols = min(num_cols, len(featured_faqs)) if len(featured_faqs) > 0 else 1
     cols = st.columns(effective_num_cols)
 
-    faq_questions_list = list(FAQ_QUESTIONS_ANSWERS.keys())
-    for i, question in enumerate(faq_questions_list):
+    for i, entry in enumerate(featured_faqs):
         with cols[i % effective_num_cols]: 
-            if st.button(question, key=f"faq_btn_{i}"):
-                st.session_state.messages.append({"role": "user", "content": question})
-                st.session_state.messages.append({"role": "assistant", "content": FAQ_QUESTIONS_ANSWERS[question]})
+            if st.button(entry.question, key=f"faq_btn_{i}"):
+                st.session_state.messages.append({"role": "user", "content": entry.question})
+                st.session_state.messages.append({"role": "assistant", "content": entry.answer, "source": "faq"})
+                run_metrics.outcome = "faq"
                 st.rerun()
 
     st.markdown("---")
 
-    for message in st.session_state.messages:
-        if message["role"] == "assistant":
-            with st.chat_message("assistant", avatar=ASSISTANT_CHAT_AVATAR):
-                st.markdown(message["content"])
-        else:
-            with st.chat_message("user", avatar=USER_AVATAR_EMOJI):
-                st.markdown(message["content"])
+    with run_metrics.stage("history_render"):
+        history_view.render_history(
+            st.session_state.messages,
+            avatars={"user": USER_AVATAR_EMOJI, "assistant": ASSISTANT_CHAT_AVATAR},
+            labels={"user": f"{USER_AVATAR_EMOJI} Você", "assistant": ASSISTANT_NAME},
+        )
 
     prompt = st.chat_input("Digite sua pergunta aqui...")
     if prompt:
-        if prompt in FAQ_QUESTIONS_ANSWERS:
+        with run_metrics.stage("faq_match"):
+            faq_match = faq.match(prompt)
+        if faq_match:
+            run_metrics.outcome = "faq"
             st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user", avatar=USER_AVATAR_EMOJI):
                 st.markdown(prompt)
             with st.chat_message("assistant", avatar=ASSISTANT_CHAT_AVATAR):
-                st.markdown(FAQ_QUESTIONS_ANSWERS[prompt])
-            st.session_state.messages.append({"role": "assistant", "content": FAQ_QUESTIONS_ANSWERS[prompt]})
+                st.markdown(faq_match.answer)
+            st.session_state.messages.append({"role": "assistant", "content": faq_match.answer, "source": "faq"})
         else:
             st.session_state.messages.append({"role": "user", "content": prompt})
             with st.chat_message("user", avatar=USER_AVATAR_EMOJI):
@@ -406,38 +187,75 @@ def main():
                 message_placeholder = st.empty()
                 message_placeholder.markdown("Digitando... ▌")
 
+                response_source = None
                 try:
-                    api_key = get_api_key()
-                    genai.configure(api_key=api_key)
-                    model = genai.GenerativeModel('gemini-1.5-flash-latest')
-
-                    chat_history_for_api = []
-                    for msg in st.session_state.messages:
-                        role = "model" if msg["role"] == "assistant" else "user"
-                        chat_history_for_api.append({"role": role, "parts": [msg["content"]]})
-
-                    history_context = chat_history_for_api[:-1]
-                    chat = model.start_chat(history=history_context)
-                    response = chat.send_message(prompt)
-                    full_response = response.text
-
+                    with run_metrics.stage("context_build"):
+                        history_context = st.session_state.context.build_history(st.session_state.messages, prompt)
+                    with run_metrics.stage("retrieval"):
+                        request = chat_pipeline.prepare(prompt, history_context)
+                    with run_metrics.stage("cache_lookup"):
+                        cached_response = response_cache.get(request.cache_key)
+                    run_metrics.model = request.model_name
+
+                    if cached_response is not None:
+                        run_metrics.outcome = "cache"
+                        full_response = cached_response
+                    else:
+                        run_metrics.outcome = "model"
+                        backend = backends.get_backend(get_api_key() if backends.requires_api_key() else None)
+                        on_wait = lambda state, value: message_placeholder.markdown(chat_pipeline.wait_message(state, value))
+                        queued = time.monotonic()
+                        with chat_pipeline.admit(request, st.session_state.session_id, on_wait=on_wait):
+                            started = time.monotonic()
+                            run_metrics.add("queue_wait", started - queued)
+                            result = streaming.stream_to_placeholder(chat_pipeline.stream_answer(backend, request), message_placeholder)
+                        run_metrics.add("model_total", time.monotonic() - started)
+                        if result.time_to_first_chunk is not None:
+                            run_metrics.add("model_first_token", result.time_to_first_chunk)
+                        if result.error is not None and not result.text:
+                            raise result.error
+                        full_response = result.text
+                        if result.error is not None:
+                            # Mantém o texto parcial em vez de trocá-lo pela mensagem de erro.
+                            st.error(f"A resposta foi interrompida: {str(result.error)}")
+                            full_response += "\n\n_(resposta interrompida)_"
+                        elif not full_response.strip():
+                            # Resposta vazia não vai para o cache.
+                            run_metrics.outcome = "empty"
+                            response_source = "empty"
+                            full_response = streaming.EMPTY_RESPONSE_TEXT
+                        else:
+                            response_cache.put(request.cache_key, prompt, request.model_name, full_response, time.monotonic() - started)
+
+                except scheduler.Overloaded:
+                    run_metrics.outcome = "overloaded"
+                    response_source = "error"
+                    full_response = "O assistente está recebendo muitas perguntas no momento. Tente novamente em alguns instantes."
+                    st.warning(full_response)
                 except Exception as e:
-                    full_response = f"Desculpe, ocorreu um erro ao contatar a IA: {str(e)}"
-                    st.error(full_response)
-
-                message_placeholder.markdown(full_response)
-                st.session_state.messages.append({"role": "assistant", "content": full_response})
-
-    st.markdown(f"""
-        <div class="footer-logos-container">
-            <p>Empresas Colaboradoras:</p>
-            <div class="footer-logos">
-                <img src="data:image/png;base64,{logo_ems_footer_base64_for_html}" alt="EMS Logo">
-                <img src="data:image/png;base64,{logo_nctech_footer_base64_for_html}" alt="NCTECH Logo">
-                <img src="data:image/png;base64,{logo_gruponc_footer_base64_for_html}" alt="GRUPONC Logo">
-            </div>
-        </div>
-    """, unsafe_allow_html=True)
+                    run_metrics.outcome = "error"
+                    response_source = "error"
+                    if scheduler.is_quota_error(e):
+                        full_response = "O limite de uso da IA foi atingido no momento. Tente novamente em alguns instantes."
+                        st.warning(full_response)
+                    else:
+                        full_response = f"Desculpe, ocorreu um erro ao contatar a IA: {str(e)}"
+                        st.error(full_response)
+
+                with run_metrics.stage("response_render"):
+                    message_placeholder.markdown(full_response)
+                message = {"role": "assistant", "content": full_response}
+                if response_source:
+                    message["source"] = response_source
+                st.session_state.messages.append(message)
+
+    st.markdown(
+        page_shell.footer_html(logo_ems_footer_src_for_html, logo_nctech_footer_src_for_html, logo_gruponc_footer_src_for_html),
+        unsafe_allow_html=True,
+    )
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    try:
+        main()
+    finally:
+        run_metrics.finish(session=st.session_state.get("session_id"))
\ No newline at end of file
@@ -0,0 +1,308 @@
+import bisect
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# --- MÉTRICAS DE LATÊNCIA POR ETAPA ---
+# Cada execução do script (uma interação do usuário) é um Run. Ele mede as
+# etapas do main() (recursos visuais, CSS, histórico, contexto, modelo,
+# renderização da resposta) e, ao terminar, registra os tempos em
+# histogramas com rótulos de etapa, sessão e modelo, além de uma linha de
+# log em JSON. Medir custa um perf_counter por etapa e uma única aquisição
+# de lock por execução, então pode ficar ligado em produção.
+#
+# Exportação, no formato texto do Prometheus:
+#   * arquivo (EMI_METRICS_FILE, padrão data/metrics.prom), regravado a cada
+#     EMI_METRICS_INTERVAL segundos, para o textfile collector do node_exporter;
+#   * endpoint HTTP /metrics, se EMI_METRICS_PORT for definido (escuta em
+#     EMI_METRICS_HOST, padrão 127.0.0.1).
+# Os contadores dos outros módulos (fila, cache, FAQ...) entram como gauges
+# por meio de register_collector().
+# Logs JSON: EMI_METRICS_LOG=stdout (padrão), um caminho de arquivo, ou off.
+#
+# O id da sessão é o token de ?sessao= na URL, que basta para abrir e
+# continuar a conversa. Ele nunca sai daqui: rótulos e logs levam só um
+# pseudônimo (início do SHA-256 do id).
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("EMI_DATA_DIR", os.path.join(BASE_DIR, "data"))
+
+ENABLED = os.environ.get("EMI_METRICS", "1") != "0"
+METRICS_FILE = os.environ.get("EMI_METRICS_FILE", os.path.join(DATA_DIR, "metrics.prom"))
+METRICS_PORT = int(os.environ.get("EMI_METRICS_PORT", "0"))
+# Só a própria máquina por padrão; use 0.0.0.0 para expor a um Prometheus externo.
+METRICS_HOST = os.environ.get("EMI_METRICS_HOST", "127.0.0.1")
+EXPORT_INTERVAL_S = float(os.environ.get("EMI_METRICS_INTERVAL", "15"))
+JSON_LOG = os.environ.get("EMI_METRICS_LOG", "stdout")
+# Acima deste número de sessões distintas, as novas aparecem como "other",
+# para não explodir a quantidade de séries.
+MAX_SESSION_LABELS = int(os.environ.get("EMI_METRICS_MAX_SESSIONS", "200"))
+
+STARTUP_STAGES = ("imports", "first_paint")
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "emi"
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_collectors = {}
+_sessions = set()
+_startup = {}
+_state = {"exporters_started": False, "log_file": None}
+
+
+def _labels(**labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items() if value is not None))
+
+
+def pseudonym(session):
+    if session is None:
+        return None
+    return hashlib.sha256(str(session).encode("utf-8")).hexdigest()[:12]
+
+
+def _session_label(session):
+    # Chamado com o lock adquirido; `session` já é o pseudônimo.
+    if session is None:
+        return None
+    if session in _sessions:
+        return session
+    if len(_sessions) < MAX_SESSION_LABELS:
+        _sessions.add(session)
+        return session
+    return "other"
+
+
+def _histogram(name, labels):
+    # Chamado com o lock adquirido.
+    key = (name, labels)
+    histogram = _histograms.get(key)
+    if histogram is None:
+        histogram = _histograms[key] = Histogram()
+    return histogram
+
+
+def observe(name, seconds, **labels):
+    if not ENABLED:
+        return
+    with _lock:
+        _histogram(name, _labels(**labels)).observe(seconds)
+
+
+def inc(name, value=1, **labels):
+    if not ENABLED:
+        return
+    key = (name, _labels(**labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def register_collector(name, function):
+    # `function()` devolve um dict; os valores numéricos viram gauges
+    # emi_<name>_<chave>. Registrar de novo o mesmo nome substitui o anterior.
+    with _lock:
+        _collectors[name] = function
+
+
+def _startup_stats():
+    with _lock:
+        return dict(_startup)
+
+
+_collectors["startup"] = _startup_stats
+
+
+# --- EXECUÇÃO DO SCRIPT ---
+
+class Run:
+    __slots__ = ("started", "stages", "outcome", "model")
+
+    def __init__(self, started=None):
+        self.started = time.perf_counter() if started is None else started
+        self.stages = {}
+        self.outcome = "render"
+        self.model = None
+
+    def add(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def mark(self, stage):
+        # Tempo desde o início da execução até este ponto (ex.: first_paint).
+        if stage not in self.stages:
+            self.stages[stage] = time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - started)
+
+    def finish(self, session=None):
+        if not ENABLED:
+            return
+        total = time.perf_counter() - self.started
+        session = pseudonym(session)
+        with _lock:
+            session_label = _session_label(session)
+            for stage, seconds in self.stages.items():
+                labels = _labels(stage=stage, session=session_label, model=self.model)
+                _histogram(f"{PREFIX}_stage_seconds", labels).observe(seconds)
+            _histogram(f"{PREFIX}_run_seconds", _labels(outcome=self.outcome, model=self.model)).observe(total)
+            counter = (f"{PREFIX}_runs_total", _labels(outcome=self.outcome))
+            _counters[counter] = _counters.get(counter, 0) + 1
+            first_run = not _startup
+            if first_run:
+                _startup.update({f"{stage}_seconds": self.stages[stage] for stage in STARTUP_STAGES
+                                 if stage in self.stages})
+                _startup["first_run_seconds"] = total
+        if first_run:
+            # A primeira execução do processo paga os imports: fica registrada à
+            # parte (gauges emi_startup_*), sem se misturar às demais.
+            log({"event": "startup", **{key.replace("_seconds", "_ms"): round(value * 1000, 2)
+                                        for key, value in _startup.items()}})
+        log({
+            "event": "run",
+            "session": session,
+            "model": self.model,
+            "outcome": self.outcome,
+            "total_ms": round(total * 1000, 2),
+            "stages_ms": {stage: round(seconds * 1000, 2) for stage, seconds in self.stages.items()},
+        })
+
+
+def log(record):
+    if JSON_LOG == "off":
+        return
+    record = {"ts": round(time.time(), 3), **record}
+    line = json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+    if JSON_LOG == "stdout":
+        print(line)
+        return
+    with _lock:
+        log_file = _state["log_file"]
+        if log_file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(JSON_LOG)), exist_ok=True)
+            log_file = _state["log_file"] = open(JSON_LOG, "a", encoding="utf-8", buffering=1)
+        log_file.write(line + "\n")
+
+
+# --- EXPORTAÇÃO (FORMATO PROMETHEUS) ---
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+def render():
+    with _lock:
+        histograms = {key: (list(h.counts), h.sum, h.count) for key, h in _histograms.items()}
+        counters = dict(_counters)
+        collectors = dict(_collectors)
+
+    lines = []
+    for name in sorted({name for name, _ in histograms}):
+        lines.append(f"# TYPE {name} histogram")
+        for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+            if metric != name:
+                continue
+            cumulative = 0
+            for bound, bucket in zip(BUCKETS, counts):
+                cumulative += bucket
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', repr(bound))])} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total:.6f}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {name} counter")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+    for collector_name, function in sorted(collectors.items()):
+        try:
+            values = function()
+        except Exception as e:
+            print(f"Aviso: falha ao coletar métricas de '{collector_name}': {e}")
+            continue
+        for key, value in sorted(values.items()):
+            if isinstance(value, (int, float)):
+                name = f"{PREFIX}_{collector_name}_{key}"
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {float(value):g}")
+    return "\n".join(lines) + "\n"
+
+
+def write_file(path=METRICS_FILE):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(temp_path, path)
+
+
+def _file_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_file(path)
+        except OSError as e:
+            print(f"Aviso: falha ao gravar as métricas em '{path}': {e}")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_exporters(path=METRICS_FILE, port=METRICS_PORT, interval=EXPORT_INTERVAL_S, host=METRICS_HOST):
+    # Uma única vez por processo, mesmo com várias sessões chamando.
+    if not ENABLED or _state["exporters_started"]:
+        return
+    with _lock:
+        if _state["exporters_started"]:
+            return
+        _state["exporters_started"] = True
+    if path:
+        threading.Thread(target=_file_loop, args=(path, interval), name="metrics-file", daemon=True).start()
+    if port:
+        try:
+            server = ThreadingHTTPServer((host, port), MetricsHandler)
+        except OSError as e:
+            print(f"Aviso: endpoint de métricas indisponível na porta {port}: {e}")
+            return
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
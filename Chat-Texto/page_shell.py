@@ -0,0 +1,301 @@
+import functools
+
+# --- FRAGMENTOS ESTÁTICOS DA PÁGINA ---
+# O CSS, o cabeçalho e o rodapé não mudam entre execuções do script; só
+# dependem das imagens (data URIs de assets.py). Cada fragmento é montado
+# uma única vez por processo e reaproveitado em todas as sessões, e o fundo
+# e o CSS do app vão num único bloco <style>, em vez de dois elementos por
+# execução. Os data URIs são as mesmas strings a cada execução (cache de
+# assets.py), então a busca no cache não recalcula o hash da imagem.
+
+CUSTOM_CSS = """
+    @import url('https://fonts.googleapis.com/css2?family=Roboto:wght@300;400;500;700&display=swap');
+
+    body {
+        font-family: 'Roboto', sans-serif;
+        color: #333;
+    }
+
+    /* Container Principal do Chat - Agora transparente */
+    .block-container {
+        max-width: 700px !important;
+        padding: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
+        background-color: rgba(255, 255, 255, 0.7) !important;
+        border-radius: 16px !important;
+        box-shadow: 0 10px 40px 0 rgba(0, 86, 145, 0.15) !important;
+        backdrop-filter: blur(8px) !important;
+        -webkit-backdrop-filter: blur(8px) !important;
+        border: 1px solid rgba(0, 86, 145, 0.1) !important;
+        margin-top: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
+        margin-bottom: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
+    }
+
+    /* Títulos */
+    h2 {
+        color: #005691 !important;
+        text-align: center !important;
+        font-weight: 700 !important;
+        margin-bottom: 0.5rem !important;
+        letter-spacing: -0.5px !important;
+    }
+    p.subheader {
+        color: #005691 !important;
+        text-align: center !important;
+        margin-bottom: 1.5rem !important; /* REDUZIDO: de 2rem para 1.5rem */
+        font-weight: 400 !important;
+        font-size: 1.1em !important;
+        opacity: 0.9 !important;
+    }
+
+    /* Balões de Mensagem - Fundos mais transparentes */
+    .stChatMessage {
+        border-radius: 12px !important;
+        padding: 16px 20px !important;
+        margin-bottom: 10px !important; /* REDUZIDO: de 15px para 10px */
+        box-shadow: 0 4px 15px rgba(0,86,145,0.1) !important;
+        border: none !important;
+        word-wrap: break-word !important;
+        line-height: 1.6 !important;
+    }
+
+    /* Mensagem do Assistente - Azul claro transparente */
+    div[data-testid="stChatMessage"]:has(div.stMarkdown) div.stMarkdown {
+        background-color: rgba(224, 242, 247, 0.85) !important;
+        color: #263238 !important;
+        border-radius: 12px !important;
+        padding: 16px 20px !important;
+        border-left: 5px solid #005691 !important;
+        padding-left: 25px !important;
+    }
+
+    /* Mensagem do Usuário - Branco transparente */
+    div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-user"]) div.stMarkdown {
+        background-color: rgba(255, 255, 255, 0.85) !important;
+        color: #263238 !important;
+        border: 1px solid rgba(0, 86, 145, 0.2) !important;
+        border-radius: 12px !important;
+        padding: 16px 20px !important;
+    }
+
+    /* Área de Input - Totalmente transparente */
+    .stChatInputContainer {
+        background-color: transparent !important;
+        border-top: 1px solid rgba(0, 86, 145, 0.1) !important;
+        padding-top: 1rem !important; /* REDUZIDO: de 1.5rem para 1rem */
+        margin-top: 0.5rem !important; /* REDUZIDO: de 1rem para 0.5rem */
+    }
+
+    /* Campo de Input - Fundo transparente */
+    .stTextInput > div > div > input {
+        border-radius: 25px !important;
+        padding: 12px 20px !important;
+        border: 1px solid #005691 !important;
+        background-color: rgba(255, 255, 255, 0.8) !important;
+        box-shadow: 0 2px 8px rgba(0,86,145,0.1) !important;
+        font-size: 1.05em !important;
+        color: #333 !important;
+    }
+
+    /* Botão de enviar - Mantém o azul EMS */
+    button[title="Send"] {
+        background-color: #005691 !important;
+        color: white !important;
+        border-radius: 50% !important;
+        width: 45px !important;
+        height: 45px !important;
+        display: flex !important;
+        align-items: center !important;
+        justify-content: center !important;
+        box-shadow: 0 4px 10px rgba(0,86,145,0.2) !important;
+        transition: background-color 0.3s ease !important;
+    }
+
+    button[title="Send"]:hover {
+        background-color: #003F6E !important;
+    }
+    .header-container {
+        text-align: center;
+        margin-bottom: 0.5rem; /* REDUZIDO: de 1rem para 0.5rem */
+        padding-top: 0.5rem; /* REDUZIDO: de 1rem para 0.5rem */
+        background-color: transparent !important;
+    }
+
+    .main-logo {
+        width: 280px; /* REDUZIDO: de 350px para 280px */
+        height: auto;
+        margin-bottom: 5px; /* REDUZIDO: de 10px para 5px */
+    }
+
+    /* ESTA É A PARTE CHAVE PARA AUMENTAR O TAMANHO DO AVATAR NO CHAT! */
+    /* Seleciona a imagem dentro do span do avatar do chat e força o tamanho */
+    div[data-testid="stChatMessage"] span[data-testid^="chatAvatarIcon-"] img {
+        width: 70px !important; /* REDUZIDO: de 90px para 70px */
+        height: 70px !important; /* REDUZIDO: de 90px para 70px */
+        object-fit: cover;
+        border-radius: 50%;
+    }
+
+    div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-assistant"]),
+    div[data-testid="stChatMessage"]:has(span[data-testid="chatAvatarIcon-user"]) {
+        background-color: transparent !important;
+    }
+
+    .stChatMessage p {
+        color: inherit !important;
+        margin-bottom: 0 !important;
+    }
+
+    /* Ajustes finos para Streamlit - pode remover se causar problemas */
+    div.css-fg4pbf,
+    div[data-testid="stVerticalBlock"] > div:first-child > div:nth-child(2) {
+        padding-top: 0.5rem !important; /* Ajustado */
+        padding-bottom: 0.5rem !important; /* Ajustado */
+    }
+
+    .main .block-container {
+        display: flex !important;
+        flex-direction: column !important;
+        align-items: center !important;
+        justify-content: center !important;
+    }
+
+    /* Estilo para a seção de FAQ */
+    .faq-section-title {
+        color: #005691 !important;
+        text-align: center !important;
+        font-weight: 700 !important;
+        margin-top: 1.5rem !important; /* REDUZIDO: de 2.5rem para 1.5rem */
+        margin-bottom: 0.5rem !important;
+        font-size: 1.6em !important; /* LIGEIRAMENTE REDUZIDO: de 1.8em para 1.6em */
+        letter-spacing: -0.5px !important;
+    }
+
+    .faq-section-description {
+        color: #555;
+        text-align: center;
+        margin-bottom: 1rem; /* REDUZIDO: de 1.5rem para 1rem */
+        font-size: 0.95em; /* LIGEIRAMENTE REDUZIDO: de 1em para 0.95em */
+        line-height: 1.5;
+    }
+
+    .faq-grid-container {
+        display: grid;
+        grid-template-columns: repeat(auto-fit, minmax(260px, 1fr)); /* REDUZIDO: minmax de 280px para 260px */
+        gap: 10px; /* REDUZIDO: de 15px para 10px */
+        margin-top: 15px; /* REDUZIDO: de 20px para 15px */
+        margin-bottom: 20px; /* REDUZIDO: de 30px para 20px */
+        width: 100%;
+        max-width: 650px;
+    }
+
+    /* NOVO ESTILO PARA OS BOTÕES DE FAQ - AGORA SIMULANDO OS CARTÕES */
+    .stButton > button {
+        background-color: rgba(255, 255, 255, 0.9) !important;
+        border: 1px solid #005691 !important;
+        border-radius: 12px !important;
+        padding: 12px 15px !important; /* REDUZIDO: de 15px 20px para 12px 15px */
+        cursor: pointer !important;
+        transition: all 0.3s ease !important;
+        box-shadow: 0 4px 12px rgba(0, 86, 145, 0.1) !important;
+        display: flex !important;
+        align-items: center !important;
+        justify-content: center !important;
+        text-align: center !important;
+        min-height: 70px !important; /* REDUZIDO: de 80px para 70px */
+        width: 100% !important;
+        color: #005691 !important;
+        font-weight: 500 !important;
+        font-size: 0.9em !important; /* LIGEIRAMENTE REDUZIDO: de 0.95em para 0.9em */
+        white-space: normal !important;
+        line-height: 1.4 !important;
+    }
+
+    .stButton > button:hover {
+        background-color: #005691 !important;
+        color: white !important;
+        transform: translateY(-3px) !important; /* EFEITO SUAVIZADO: de -5px para -3px */
+        box-shadow: 0 5px 15px rgba(0, 86, 145, 0.2) !important; /* SOMBRA SUAVIZADA */
+    }
+
+    /* Novo estilo para o rodapé de logos */
+    .footer-logos-container {
+        text-align: center;
+        margin-top: 2rem; /* REDUZIDO: de 3rem para 2rem */
+        padding-top: 1rem; /* REDUZIDO: de 1.5rem para 1rem */
+        border-top: 1px solid rgba(0, 86, 145, 0.1);
+        background-color: rgba(0, 0, 0, 0.1);
+        border-radius: 0 0 16px 16px;
+        padding-bottom: 0.8rem; /* REDUZIDO: de 1rem para 0.8rem */
+    }
+
+    .footer-logos-container p {
+        color: #005691;
+        font-size: 0.85em; /* LIGEIRAMENTE REDUZIDO: de 0.9em para 0.85em */
+        margin-bottom: 0.8rem; /* REDUZIDO: de 1rem para 0.8rem */
+        font-weight: 500;
+    }
+
+    .footer-logos {
+        display: flex;
+        justify-content: center;
+        align-items: center;
+        gap: 15px; /* REDUZIDO: de 20px para 15px */
+        flex-wrap: wrap;
+    }
+
+    .footer-logos img {
+        height: 35px; /* REDUZIDO: de 40px para 35px */
+        width: auto;
+        object-fit: contain;
+        filter: drop-shadow(0 2px 4px rgba(0,0,0,0.1)); /* SOMBRA SUAVIZADA */
+    }
+"""
+
+
+@functools.lru_cache(maxsize=8)
+def style_html(background_data_uri=None):
+    background = ""
+    if background_data_uri:
+        background = f"""
+    .stApp {{
+        background-image: url("{background_data_uri}");
+        background-size: cover;
+        background-repeat: no-repeat;
+        background-attachment: fixed;
+        background-position: center;
+    }}
+"""
+    # O @import das fontes precisa vir antes de qualquer regra.
+    return f"<style>{CUSTOM_CSS}{background}</style>"
+
+
+@functools.lru_cache(maxsize=8)
+def header_html(logo_src):
+    return f"""
+    <div class="header-container">
+        <img src="{logo_src}" class="main-logo">
+    </div>
+"""
+
+
+@functools.lru_cache(maxsize=8)
+def footer_html(ems_src, nctech_src, gruponc_src):
+    return f"""
+    <div class="footer-logos-container">
+        <p>Empresas Colaboradoras:</p>
+        <div class="footer-logos">
+            <img src="{ems_src}" alt="EMS Logo">
+            <img src="{nctech_src}" alt="NCTECH Logo">
+            <img src="{gruponc_src}" alt="GRUPONC Logo">
+        </div>
+    </div>
+"""
+
+
+def get_stats():
+    stats = {}
+    for name, function in (("style", style_html), ("header", header_html), ("footer", footer_html)):
+        info = function.cache_info()
+        stats[f"{name}_hits"] = info.hits
+        stats[f"{name}_misses"] = info.misses
+    return stats
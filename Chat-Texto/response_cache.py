@@ -0,0 +1,234 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import faq
+import vector_index
+from text_utils import normalize_text
+
+# --- CACHE PERSISTENTE DE RESPOSTAS ---
+# Respostas do modelo guardadas em SQLite (modo WAL), compartilhadas entre as
+# sessões e entre os processos do Streamlit, e preservadas entre reinícios.
+# A chave combina a pergunta normalizada, a impressão digital do contexto
+# (histórico enviado + trechos recuperados) e o nome do modelo.
+#
+# Cada resposta também guarda a "geração" do conteúdo de base (hash do índice
+# de documentos e do faqs.json): quando um deles muda, as respostas antigas
+# são invalidadas. Há ainda expiração por TTL e limite de tamanho (LRU).
+# Uso: python response_cache.py --stats | --clear
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.environ.get("EMI_DATA_DIR", os.path.join(BASE_DIR, "data"))
+CACHE_PATH = os.environ.get("EMI_CACHE_PATH", os.path.join(DATA_DIR, "response_cache.sqlite3"))
+
+ENABLED = os.environ.get("EMI_CACHE", "1") != "0"
+TTL_S = float(os.environ.get("EMI_CACHE_TTL", str(7 * 24 * 3600)))
+MAX_ENTRIES = int(os.environ.get("EMI_CACHE_MAX_ENTRIES", "5000"))
+EVICT_EVERY = 50
+
+# Arquivos cujo conteúdo, se mudar, invalida as respostas em cache.
+SOURCE_FILES = (
+    os.path.join(vector_index.INDEX_DIR, vector_index.META_FILE),
+    faq.FAQ_PATH,
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS answers (
+    key TEXT PRIMARY KEY,
+    question TEXT NOT NULL,
+    model TEXT NOT NULL,
+    generation TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0,
+    latency_ms REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at);
+CREATE TABLE IF NOT EXISTS stats (
+    name TEXT PRIMARY KEY,
+    value REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+_lock = threading.Lock()
+_state = {"generation_key": None, "generation": None, "puts": 0}
+
+
+def _connect(path=CACHE_PATH):
+    connection = getattr(_local, "connection", None)
+    if connection is None or getattr(_local, "path", None) != path:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Uma conexão por thread; o timeout cobre a concorrência entre processos.
+        connection = sqlite3.connect(path, timeout=5.0, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        connection.executescript(_SCHEMA)
+        _local.connection = connection
+        _local.path = path
+    return connection
+
+
+def _hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def context_fingerprint(history, chunks):
+    # O mesmo texto de pergunta só pode reaproveitar a resposta se o histórico
+    # enviado e os trechos recuperados forem os mesmos.
+    payload = json.dumps(
+        {"history": history, "chunks": [chunk.get("id") for chunk in chunks]},
+        ensure_ascii=False, sort_keys=True,
+    )
+    return _hash(payload)
+
+
+def make_key(question, context_fp, model):
+    return _hash(normalize_text(question), context_fp, model)
+
+
+def current_generation():
+    # Recalcula o hash dos arquivos de base só quando mtime/tamanho mudam.
+    stats = []
+    for path in SOURCE_FILES:
+        try:
+            stat = os.stat(path)
+            stats.append((path, stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            stats.append((path, None, None))
+    key = tuple(stats)
+    if _state["generation_key"] == key:
+        return _state["generation"]
+    parts = []
+    for path, mtime, _ in stats:
+        if mtime is None:
+            parts.append("")
+            continue
+        with open(path, "rb") as f:
+            parts.append(hashlib.sha256(f.read()).hexdigest())
+    generation = _hash(*parts)
+    with _lock:
+        previous = _state["generation"]
+        _state["generation_key"] = key
+        _state["generation"] = generation
+    if previous is not None and previous != generation:
+        invalidate(keep_generation=generation)
+    return generation
+
+
+def _bump(connection, **deltas):
+    for name, delta in deltas.items():
+        connection.execute(
+            "INSERT INTO stats (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value",
+            (name, delta),
+        )
+
+
+def get(key):
+    if not ENABLED:
+        return None
+    try:
+        connection = _connect()
+        now = time.time()
+        row = connection.execute(
+            "SELECT answer, generation, created_at, latency_ms FROM answers WHERE key = ?", (key,)
+        ).fetchone()
+        if row is not None:
+            answer, generation, created_at, latency_ms = row
+            if generation == current_generation() and now - created_at <= TTL_S and answer.strip():
+                connection.execute(
+                    "UPDATE answers SET accessed_at = ?, hits = hits + 1 WHERE key = ?", (now, key)
+                )
+                _bump(connection, hits=1, latency_saved_ms=latency_ms)
+                return answer
+            connection.execute("DELETE FROM answers WHERE key = ?", (key,))
+        _bump(connection, misses=1)
+    except sqlite3.Error as e:
+        print(f"Aviso: falha ao ler o cache de respostas: {e}")
+    return None
+
+
+def put(key, question, model, answer, latency_s):
+    # Uma resposta em branco (ex.: bloqueada pelos filtros) seria servida a
+    # todas as perguntas iguais até expirar; não é gravada.
+    if not ENABLED or not answer or not answer.strip():
+        return
+    try:
+        connection = _connect()
+        now = time.time()
+        connection.execute(
+            "INSERT OR REPLACE INTO answers "
+            "(key, question, model, generation, answer, created_at, accessed_at, hits, latency_ms) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 0, ?)",
+            (key, question, model, current_generation(), answer, now, now, latency_s * 1000),
+        )
+        with _lock:
+            _state["puts"] += 1
+            evict_now = _state["puts"] % EVICT_EVERY == 1
+        if evict_now:
+            evict(connection)
+    except sqlite3.Error as e:
+        print(f"Aviso: falha ao gravar no cache de respostas: {e}")
+
+
+def evict(connection=None):
+    # Remove expirados e, acima do limite, os menos acessados recentemente.
+    connection = connection or _connect()
+    connection.execute("DELETE FROM answers WHERE created_at < ?", (time.time() - TTL_S,))
+    connection.execute(
+        "DELETE FROM answers WHERE key IN ("
+        "SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+        (MAX_ENTRIES,),
+    )
+
+
+def invalidate(keep_generation=None):
+    # Sem argumento, apaga tudo; com `keep_generation`, só o que é de outra geração.
+    connection = _connect()
+    if keep_generation is None:
+        deleted = connection.execute("DELETE FROM answers").rowcount
+    else:
+        deleted = connection.execute("DELETE FROM answers WHERE generation != ?", (keep_generation,)).rowcount
+    _bump(connection, invalidated=deleted)
+    return deleted
+
+
+def get_stats():
+    connection = _connect()
+    stats = {name: value for name, value in connection.execute("SELECT name, value FROM stats")}
+    stats["entries"] = connection.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+    lookups = stats.get("hits", 0) + stats.get("misses", 0)
+    stats["hit_rate"] = stats.get("hits", 0) / lookups if lookups else 0.0
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Administra o cache de respostas do CHAT EMI.")
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--stats", action="store_true", help="Mostra acertos, falhas e tempo economizado.")
+    group.add_argument("--clear", action="store_true", help="Apaga todas as respostas em cache.")
+    args = parser.parse_args(argv)
+    if args.clear:
+        print(f"{invalidate()} respostas removidas.")
+    else:
+        stats = get_stats()
+        print(
+            f"Entradas: {stats['entries']} | acertos: {stats.get('hits', 0):.0f} | falhas: {stats.get('misses', 0):.0f} "
+            f"| taxa de acerto: {stats['hit_rate']:.0%} | tempo economizado: {stats.get('latency_saved_ms', 0) / 1000:.1f} s"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,120 @@
+import os
+import threading
+
+import numpy as np
+
+import lexical_index
+import vector_index
+
+# --- RECUPERAÇÃO DE TRECHOS DOS DOCUMENTOS ---
+# O índice é aberto na primeira pergunta (não no import) e fica em memória,
+# compartilhado por todas as sessões do processo; se o ingest.py gravar uma
+# nova versão, ela é reaberta na pergunta seguinte. Só os `TOP_K` trechos mais
+# relevantes vão para o prompt enviado ao Gemini.
+# O ranking é híbrido: similaridade vetorial combinada com BM25 (termos exatos
+# como números de artigos), com peso `HYBRID_ALPHA` para o vetorial.
+
+TOP_K = int(os.environ.get("EMI_RAG_TOP_K", "4"))
+MIN_SCORE = float(os.environ.get("EMI_RAG_MIN_SCORE", "0.15"))
+ENABLED = os.environ.get("EMI_RAG", "1") != "0"
+HYBRID_ALPHA = float(os.environ.get("EMI_RAG_HYBRID_ALPHA", "0.5"))
+
+_lock = threading.Lock()
+_state = {"key": None, "index": None, "embedder": None, "lexical": None}
+
+
+def _index_key():
+    # Muda quando o ingest.py grava uma nova versão do índice.
+    try:
+        stat = os.stat(os.path.join(vector_index.INDEX_DIR, vector_index.META_FILE))
+    except OSError:
+        return "missing"
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _load():
+    from embeddings import get_embedder
+
+    if not vector_index.exists():
+        # O índice é gerado fora do app (python ingest.py); aqui só é aberto.
+        raise FileNotFoundError(f"índice não encontrado em '{vector_index.INDEX_DIR}'. Rode `python ingest.py`.")
+    index = vector_index.VectorIndex.load()
+    lexical = None
+    if lexical_index.exists():
+        try:
+            lexical = lexical_index.LexicalIndex.load()
+        except ValueError as e:
+            print(f"Aviso: {e} Usando só a busca vetorial.")
+        else:
+            if lexical.generation != index.generation or lexical.n_docs != len(index):
+                print("Aviso: índice lexical desatualizado em relação ao vetorial; usando só a busca vetorial.")
+                lexical = None
+    return index, get_embedder(index.embedder_name), lexical
+
+
+def get_retriever():
+    key = _index_key()
+    if _state["key"] == key:
+        return _state["index"], _state["embedder"], _state["lexical"]
+    with _lock:
+        if _state["key"] != key:
+            try:
+                _state["index"], _state["embedder"], _state["lexical"] = _load()
+            except vector_index.IndexNotReady as e:
+                # O ingest.py está no meio da troca dos arquivos: segue com o
+                # índice anterior (se houver) e tenta de novo na próxima pergunta.
+                print(f"Aviso: índice em atualização, usando a versão anterior: {e}")
+                return _state["index"], _state["embedder"], _state["lexical"]
+            except Exception as e:
+                _state["index"], _state["embedder"], _state["lexical"] = None, None, None
+                print(f"Aviso: recuperação de documentos desativada: {e}")
+            _state["key"] = key
+    return _state["index"], _state["embedder"], _state["lexical"]
+
+
+def retrieve(query, k=TOP_K, min_score=MIN_SCORE, alpha=HYBRID_ALPHA):
+    if not ENABLED:
+        return []
+    index, embedder, lexical = get_retriever()
+    if index is None or not len(index):
+        return []
+    vector_scores = index.scores(embedder.embed_query(query))
+    if lexical is not None:
+        lexical_scores = lexical.scores(query)
+        scores = lexical_index.hybrid_scores(vector_scores, lexical_scores, alpha)
+        # Um trecho entra se for semanticamente próximo ou contiver termos da pergunta.
+        eligible = (vector_scores >= min_score) | (lexical_scores > 0)
+    else:
+        lexical_scores = None
+        scores = vector_scores
+        eligible = vector_scores >= min_score
+    candidates = np.flatnonzero(eligible)
+    top = candidates[np.argsort(-scores[candidates])][:k]
+    return [
+        dict(
+            index.chunks[i],
+            score=float(scores[i]),
+            vector_score=float(vector_scores[i]),
+            lexical_score=float(lexical_scores[i]) if lexical_scores is not None else 0.0,
+        )
+        for i in top
+    ]
+
+
+def format_source(chunk):
+    title = os.path.splitext(os.path.basename(chunk["source"]))[0]
+    return f"{title}, p. {chunk['page']}"
+
+
+def build_prompt(question, chunks):
+    if not chunks:
+        return question
+    excerpts = "\n\n".join(
+        f"[{number}] ({format_source(chunk)})\n{chunk['text']}" for number, chunk in enumerate(chunks, start=1)
+    )
+    return (
+        "Use os trechos abaixo, extraídos dos documentos oficiais de governança, para responder. "
+        "Se eles não forem suficientes, diga isso e responda com base no seu conhecimento geral.\n\n"
+        f"{excerpts}\n\n"
+        f"Pergunta: {question}"
+    )
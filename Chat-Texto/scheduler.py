@@ -0,0 +1,270 @@
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+# --- CONTROLE DE ADMISSÃO DAS CHAMADAS AO MODELO ---
+# Limita quantas chamadas ao Gemini rodam ao mesmo tempo no processo:
+#   * teto global de chamadas simultâneas (EMI_MAX_CONCURRENT_CALLS);
+#   * limite por sessão em balde de fichas (EMI_SESSION_RATE_PER_MIN
+#     perguntas por minuto, com rajada de até EMI_SESSION_BURST);
+#   * o excedente espera numa fila limitada (EMI_QUEUE_MAX), atendida em
+#     rodízio entre as sessões; com a fila cheia, a pergunta é recusada
+#     (Overloaded) com uma mensagem amigável;
+#   * erros de cota (429 / ResourceExhausted) reduzem o teto pela metade e
+#     pausam novas chamadas por um intervalo que cresce exponencialmente; a
+#     chamada que recebeu o erro é repetida depois da pausa. Cada chamada bem
+#     sucedida devolve aos poucos o teto original.
+# Perguntas que só acompanham uma chamada já em andamento (single_flight.py)
+# passam pelo limite da sessão, mas não ocupam lugar na fila nem no teto.
+
+MAX_CONCURRENT_CALLS = int(os.environ.get("EMI_MAX_CONCURRENT_CALLS", "4"))
+SESSION_RATE_PER_MIN = float(os.environ.get("EMI_SESSION_RATE_PER_MIN", "10"))
+SESSION_BURST = int(os.environ.get("EMI_SESSION_BURST", "3"))
+QUEUE_MAX = int(os.environ.get("EMI_QUEUE_MAX", "100"))
+BACKOFF_INITIAL_S = float(os.environ.get("EMI_BACKOFF_INITIAL", "1.0"))
+BACKOFF_MAX_S = float(os.environ.get("EMI_BACKOFF_MAX", "60.0"))
+BACKOFF_RETRIES = int(os.environ.get("EMI_BACKOFF_RETRIES", "4"))
+LIMIT_RECOVERY_STEP = 0.25
+WAIT_POLL_S = 0.5
+WAIT_SAMPLES = 1000
+MAX_IDLE_BUCKETS = 1000
+
+
+class Overloaded(Exception):
+    pass
+
+
+def is_quota_error(error):
+    if getattr(error, "code", None) == 429 or type(error).__name__ in ("ResourceExhausted", "TooManyRequests"):
+        return True
+    message = str(error).lower()
+    return "429" in message or "quota" in message or "rate limit" in message
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate_per_s, capacity):
+        self.rate = rate_per_s
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        # Consome uma ficha; devolve 0 ou quantos segundos faltam para a próxima.
+        now = time.monotonic()
+        self._refill(now)
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate if self.rate > 0 else float("inf")
+
+    def full(self):
+        self._refill(time.monotonic())
+        return self.tokens >= self.capacity
+
+
+class Ticket:
+    __slots__ = ("session_id", "enqueued")
+
+    def __init__(self, session_id):
+        self.session_id = session_id
+        self.enqueued = time.monotonic()
+
+
+class Scheduler:
+    def __init__(self, max_concurrency=MAX_CONCURRENT_CALLS, rate_per_min=SESSION_RATE_PER_MIN,
+                 burst=SESSION_BURST, queue_max=QUEUE_MAX):
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_per_s = rate_per_min / 60.0
+        self.burst = max(1, burst)
+        self.queue_max = queue_max
+        self.limit = float(self.max_concurrency)
+        self.active = 0
+        self.cooldown_until = 0.0
+        self.backoff_s = 0.0
+        self._condition = threading.Condition()
+        self._queues = OrderedDict()
+        self._queued = 0
+        self._buckets = {}
+        self._waits = deque(maxlen=WAIT_SAMPLES)
+        self._stats = {"admitted": 0, "shared": 0, "rejected": 0, "rate_limited": 0, "backoffs": 0,
+                       "max_queue_depth": 0}
+
+    # --- LIMITE POR SESSÃO ---
+
+    def _take_token(self, session_id):
+        with self._condition:
+            bucket = self._buckets.get(session_id)
+            if bucket is None:
+                if len(self._buckets) >= MAX_IDLE_BUCKETS:
+                    self._buckets = {key: b for key, b in self._buckets.items() if not b.full()}
+                bucket = self._buckets[session_id] = TokenBucket(self.rate_per_s, self.burst)
+            return bucket.take()
+
+    def _wait_for_token(self, session_id, on_wait):
+        wait = self._take_token(session_id)
+        if wait <= 0:
+            return
+        with self._condition:
+            self._stats["rate_limited"] += 1
+        while wait > 0:
+            if on_wait is not None:
+                on_wait("rate_limited", wait)
+            time.sleep(min(wait, WAIT_POLL_S * 2))
+            wait = self._take_token(session_id)
+
+    # --- FILA E TETO GLOBAL ---
+
+    def _head(self):
+        for queue in self._queues.values():
+            return queue[0]
+        return None
+
+    def _position(self, ticket):
+        # Posição no rodízio: quantas sessões serão atendidas antes desta.
+        position = 1
+        for session_id, queue in self._queues.items():
+            if session_id == ticket.session_id:
+                return position + queue.index(ticket) * len(self._queues)
+            position += 1
+        return position
+
+    def _can_run(self, ticket):
+        return (self._head() is ticket and self.active < int(self.limit)
+                and time.monotonic() >= self.cooldown_until)
+
+    def _dequeue(self, ticket):
+        queue = self._queues.pop(ticket.session_id)
+        queue.remove(ticket)
+        if queue:
+            # Volta para o fim do rodízio.
+            self._queues[ticket.session_id] = queue
+        self._queued -= 1
+
+    def _wait_in_queue(self, session_id, on_wait):
+        with self._condition:
+            if self._queued >= self.queue_max:
+                self._stats["rejected"] += 1
+                raise Overloaded("A fila de perguntas está cheia.")
+            ticket = Ticket(session_id)
+            self._queues.setdefault(session_id, deque()).append(ticket)
+            self._queued += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._queued)
+        last_position = None
+        try:
+            while True:
+                with self._condition:
+                    if self._can_run(ticket):
+                        self._dequeue(ticket)
+                        self.active += 1
+                        ticket = None
+                        break
+                    position = self._position(ticket)
+                    cooling = self.cooldown_until - time.monotonic()
+                if on_wait is not None and position != last_position:
+                    on_wait("queued", position)
+                    last_position = position
+                with self._condition:
+                    self._condition.wait(min(WAIT_POLL_S, cooling) if cooling > 0 else WAIT_POLL_S)
+        finally:
+            if ticket is not None:
+                # Sessão desistiu (ou erro) enquanto esperava.
+                with self._condition:
+                    self._dequeue(ticket)
+                    self._condition.notify_all()
+
+    @contextmanager
+    def admit(self, session_id, on_wait=None, shared=False):
+        # Bloqueia até a pergunta poder ir ao modelo. `on_wait(state, value)` é
+        # chamada durante a espera: ("rate_limited", segundos) ou ("queued", posição).
+        started = time.monotonic()
+        self._wait_for_token(session_id, on_wait)
+        if not shared:
+            self._wait_in_queue(session_id, on_wait)
+        waited = time.monotonic() - started
+        with self._condition:
+            self._stats["shared" if shared else "admitted"] += 1
+            self._waits.append(waited)
+        try:
+            yield
+        finally:
+            if not shared:
+                with self._condition:
+                    self.active -= 1
+                    self._condition.notify_all()
+
+    # --- BACKOFF ADAPTATIVO ---
+
+    def report_success(self):
+        with self._condition:
+            self.backoff_s = 0.0
+            if self.limit < self.max_concurrency:
+                self.limit = min(self.max_concurrency, self.limit + LIMIT_RECOVERY_STEP)
+                self._condition.notify_all()
+
+    def report_quota_error(self):
+        # Devolve quanto tempo esperar antes de tentar de novo.
+        with self._condition:
+            self._stats["backoffs"] += 1
+            self.limit = max(1.0, self.limit / 2)
+            self.backoff_s = min(BACKOFF_MAX_S, self.backoff_s * 2 if self.backoff_s else BACKOFF_INITIAL_S)
+            delay = self.backoff_s * random.uniform(0.8, 1.2)
+            self.cooldown_until = max(self.cooldown_until, time.monotonic() + delay)
+            return delay
+
+    def with_backoff(self, open_stream, retries=BACKOFF_RETRIES):
+        # Abre o stream e espera o primeiro pedaço; um erro de cota antes dele
+        # pausa o agendador e repete a chamada. Erros depois do primeiro pedaço
+        # seguem para quem consome o stream.
+        attempt = 0
+        while True:
+            try:
+                chunks = iter(open_stream())
+                first = next(chunks, None)
+                break
+            except Exception as e:
+                if not is_quota_error(e) or attempt >= retries:
+                    raise
+                attempt += 1
+                time.sleep(self.report_quota_error())
+        self.report_success()
+        if first is not None:
+            yield first
+            yield from chunks
+
+    def get_stats(self):
+        with self._condition:
+            stats = dict(self._stats)
+            stats.update(queue_depth=self._queued, active=self.active, limit=int(self.limit),
+                         cooldown_s=max(0.0, self.cooldown_until - time.monotonic()))
+            waits = sorted(self._waits)
+        stats["wait_p50_s"] = waits[len(waits) // 2] if waits else 0.0
+        stats["wait_p95_s"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0
+        stats["wait_max_s"] = waits[-1] if waits else 0.0
+        return stats
+
+
+# --- INSTÂNCIA COMPARTILHADA POR PROCESSO ---
+
+_lock = threading.Lock()
+_state = {"scheduler": None}
+
+
+def get_scheduler():
+    if _state["scheduler"] is None:
+        with _lock:
+            if _state["scheduler"] is None:
+                _state["scheduler"] = Scheduler()
+    return _state["scheduler"]
+
+
+def get_stats():
+    return get_scheduler().get_stats()
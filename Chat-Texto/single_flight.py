@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+
+# --- CHAMADAS COMPARTILHADAS AO MODELO (SINGLE-FLIGHT) ---
+# Quando várias sessões fazem a mesma pergunta, com o mesmo contexto, ao mesmo
+# tempo, só uma chamada vai ao modelo. Ela roda numa thread própria e cada
+# sessão acompanha o stream a partir do início: quem chega no meio recebe
+# primeiro os pedaços já produzidos e depois os novos, conforme chegam.
+#
+# * Cada chamada tem um prazo (EMI_SINGLE_FLIGHT_TIMEOUT); ao estourar, todas
+#   as sessões que a aguardam recebem TimeoutError.
+# * Se todas as sessões desistirem (página fechada, nova pergunta), a chamada
+#   é cancelada e o stream do modelo deixa de ser consumido.
+# * A chamada sai da tabela assim que termina; perguntas repetidas depois
+#   disso são atendidas pelo cache de respostas (response_cache.py).
+
+TIMEOUT_S = float(os.environ.get("EMI_SINGLE_FLIGHT_TIMEOUT", "120"))
+ENABLED = os.environ.get("EMI_SINGLE_FLIGHT", "1") != "0"
+
+
+class FlightCancelled(Exception):
+    pass
+
+
+class Flight:
+    def __init__(self, key, timeout):
+        self.key = key
+        self.deadline = time.monotonic() + timeout
+        self.pieces = []
+        self.done = False
+        self.error = None
+        self.cancelled = False
+        self.waiters = 0
+        self.condition = threading.Condition()
+
+
+_lock = threading.Lock()
+_flights = {}
+_stats = {"calls": 0, "deduplicated": 0, "cancelled": 0, "timeouts": 0, "errors": 0}
+
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+
+
+def _finish(flight, error=None):
+    with flight.condition:
+        if flight.done:
+            return
+        flight.done = True
+        flight.error = error
+        flight.condition.notify_all()
+    with _lock:
+        if _flights.get(flight.key) is flight:
+            del _flights[flight.key]
+
+
+def _run(flight, open_stream):
+    # Thread que consome o stream do modelo e publica os pedaços.
+    chunks = None
+    try:
+        chunks = open_stream()
+        for piece in chunks:
+            with flight.condition:
+                if flight.cancelled or flight.done:
+                    break
+                flight.pieces.append(piece)
+                flight.condition.notify_all()
+    except Exception as e:
+        _count("errors")
+        _finish(flight, e)
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            close()
+        _finish(flight)
+
+
+def _leave(flight):
+    with flight.condition:
+        flight.waiters -= 1
+        abandoned = flight.waiters == 0 and not flight.done
+        if abandoned:
+            flight.cancelled = True
+    if abandoned:
+        _count("cancelled")
+        _finish(flight, FlightCancelled("Todas as sessões desistiram da resposta."))
+
+
+def _follow(flight):
+    position = 0
+    try:
+        while True:
+            with flight.condition:
+                while position == len(flight.pieces) and not flight.done:
+                    remaining = flight.deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    flight.condition.wait(remaining)
+                pieces = flight.pieces[position:]
+                position += len(pieces)
+                done, error = flight.done, flight.error
+            for piece in pieces:
+                yield piece
+            if done and position == len(flight.pieces):
+                if error is not None:
+                    raise error
+                return
+            if not done and not pieces and time.monotonic() >= flight.deadline:
+                with flight.condition:
+                    expired = not flight.done
+                    flight.cancelled = True
+                if expired:
+                    _count("timeouts")
+                    _finish(flight, TimeoutError("O modelo não respondeu dentro do prazo."))
+    finally:
+        _leave(flight)
+
+
+def stream(key, open_stream, timeout=None):
+    # Devolve um iterador com os pedaços da resposta para `key`. `open_stream`
+    # (sem argumentos) abre o stream do modelo; só é chamada por quem inicia a
+    # chamada. Sessões que chegam enquanto ela está em andamento só acompanham.
+    if not ENABLED:
+        with _lock:
+            _stats["calls"] += 1
+        return open_stream()
+    with _lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = Flight(key, TIMEOUT_S if timeout is None else timeout)
+            _flights[key] = flight
+            _stats["calls"] += 1
+        else:
+            _stats["deduplicated"] += 1
+        with flight.condition:
+            flight.waiters += 1
+    if leader:
+        threading.Thread(target=_run, args=(flight, open_stream), name="single-flight", daemon=True).start()
+    return _follow(flight)
+
+
+def join(key):
+    # Entra como seguidora de uma chamada em andamento, se houver, e devolve o
+    # Flight (ou None). Decidir e registrar acontecem sob o mesmo lock: se a
+    # chamada terminar logo depois, os pedaços continuam guardados no Flight e
+    # a sessão não vira, sem saber, a que faz a chamada ao modelo.
+    if not ENABLED:
+        return None
+    with _lock:
+        flight = _flights.get(key)
+        if flight is None:
+            return None
+        _stats["deduplicated"] += 1
+        with flight.condition:
+            flight.waiters += 1
+    return flight
+
+
+def follow(flight):
+    # Pedaços de um Flight obtido com join(); sai dele ao terminar.
+    return _follow(flight)
+
+
+def leave(flight):
+    # Para quem entrou com join() e não chegou a chamar follow().
+    _leave(flight)
+
+
+def get_stats():
+    with _lock:
+        stats = dict(_stats)
+        stats["in_flight"] = len(_flights)
+    requests = stats["calls"] + stats["deduplicated"]
+    stats["dedup_rate"] = stats["deduplicated"] / requests if requests else 0.0
+    return stats
@@ -0,0 +1,74 @@
+import time
+from dataclasses import dataclass
+
+# --- STREAMING DAS RESPOSTAS ---
+# Escreve os pedaços da resposta no placeholder à medida que chegam, limitando
+# a frequência de repintura para que respostas longas não gerem milhares de
+# chamadas de markdown.
+
+STREAM_CURSOR = " ▌"
+MIN_RENDER_INTERVAL_S = 0.1
+# Mostrado quando o stream termina sem erro mas sem texto (ex.: todos os
+# pedaços bloqueados pelos filtros de segurança), em vez de um balão vazio.
+EMPTY_RESPONSE_TEXT = "Não consegui gerar uma resposta para essa pergunta. Tente reformulá-la."
+
+
+@dataclass
+class StreamResult:
+    text: str
+    error: Exception = None
+    chunks: int = 0
+    renders: int = 0
+    time_to_first_chunk: float = None
+    elapsed: float = 0.0
+
+
+def iter_response_text(response):
+    # Converte a resposta em stream do Gemini em pedaços de texto.
+    for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Pedaço sem texto (ex.: bloqueado pelos filtros de segurança).
+            continue
+        if text:
+            yield text
+
+
+def stream_to_placeholder(chunks, placeholder, min_interval=MIN_RENDER_INTERVAL_S, cursor=STREAM_CURSOR):
+    # Consome `chunks` e atualiza `placeholder` no máximo a cada `min_interval`
+    # segundos. Um erro no meio do stream não descarta o texto já recebido:
+    # ele é devolvido em `StreamResult.error` junto com o texto parcial.
+    # O placeholder fica com o último texto parcial; quem chama faz a
+    # renderização final (sem cursor).
+    result = StreamResult(text="")
+    started = time.monotonic()
+    last_render = None
+    text = ""
+    try:
+        for piece in chunks:
+            now = time.monotonic()
+            if result.time_to_first_chunk is None:
+                result.time_to_first_chunk = now - started
+            text += piece
+            result.chunks += 1
+            if last_render is None or now - last_render >= min_interval:
+                placeholder.markdown(text + cursor)
+                result.renders += 1
+                last_render = now
+    except Exception as e:
+        result.error = e
+    result.text = text
+    result.elapsed = time.monotonic() - started
+    return result
+
+
+def fake_stream(text, chunk_size=8, delay=0.02, fail_after=None):
+    # Backend de streaming local, para testar o fluxo sem chamar a API.
+    # `fail_after` simula uma falha depois de N pedaços.
+    for index, start in enumerate(range(0, len(text), chunk_size)):
+        if fail_after is not None and index >= fail_after:
+            raise ConnectionError("Stream interrompido (simulado).")
+        if delay:
+            time.sleep(delay)
+        yield text[start:start + chunk_size]
@@ -0,0 +1,12 @@
+import os
+import sys
+import tempfile
+
+# As configurações dos módulos do app são lidas na importação: o ambiente de
+# teste (dados num diretório temporário, sem logs de métricas) precisa estar
+# pronto antes do primeiro import.
+os.environ["EMI_DATA_DIR"] = tempfile.mkdtemp(prefix="chat_emi_tests_")
+os.environ["EMI_METRICS_LOG"] = "off"
+os.environ["EMI_CACHE"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,24 @@
+from context import ConversationContext
+
+
+def history_after(*exchanges):
+    messages = [{"role": "assistant", "content": "Olá!", "source": "greeting"}]
+    for user, assistant, source in exchanges:
+        messages.append({"role": "user", "content": user})
+        message = {"role": "assistant", "content": assistant}
+        if source:
+            message["source"] = source
+        messages.append(message)
+    messages.append({"role": "user", "content": "E o encarregado?"})
+    return ConversationContext().build_history(messages, "E o encarregado?")
+
+
+def test_app_notices_are_not_sent_to_the_model():
+    clean = history_after(("O que é a LGPD?", "É a lei de proteção de dados.", None))
+    with_notices = history_after(
+        ("O que é a LGPD?", "É a lei de proteção de dados.", None),
+        ("Quem é o controlador?", "O assistente está recebendo muitas perguntas no momento.", "error"),
+        ("Quem é o controlador?", "Desculpe, ocorreu um erro ao contatar a IA: 503", "error"),
+        ("Quem é o titular?", "Não recebi resposta do modelo.", "empty"),
+    )
+    assert with_notices == clean
@@ -0,0 +1,70 @@
+import uuid
+
+import conversation_store
+from conversation_store import Conversation
+
+
+def contents(conversation):
+    return [message["content"] for message in conversation]
+
+
+def new_session(*messages):
+    conversation = Conversation(uuid.uuid4().hex)
+    for content in messages:
+        conversation.append({"role": "assistant", "content": content})
+    conversation_store.flush()
+    return conversation.session_id
+
+
+def test_two_tabs_on_one_session_keep_their_own_messages():
+    session_id = new_session("greet")
+    tab_a = Conversation.load(session_id, window=2)
+    tab_b = Conversation.load(session_id, window=2)
+    for turn in range(3):
+        for tab, name in ((tab_a, "A"), (tab_b, "B")):
+            tab.append({"role": "user", "content": f"{name}-q{turn}"})
+        for tab, name in ((tab_a, "A"), (tab_b, "B")):
+            tab.append({"role": "assistant", "content": f"{name}-ans{turn}"})
+    conversation_store.flush()
+
+    expected_a = ["greet", "A-q0", "A-ans0", "A-q1", "A-ans1", "A-q2", "A-ans2"]
+    expected_b = ["greet", "B-q0", "B-ans0", "B-q1", "B-ans1", "B-q2", "B-ans2"]
+    assert contents(tab_a) == expected_a
+    assert contents(tab_b) == expected_b
+    # Uma das abas continua no id original; a outra foi separada num id novo.
+    assert session_id in (tab_a.session_id, tab_b.session_id)
+    assert tab_a.session_id != tab_b.session_id
+
+    # Retomar cada id devolve a conversa de uma só aba, na ordem.
+    assert contents(Conversation.load(tab_a.session_id)) == expected_a
+    assert contents(Conversation.load(tab_b.session_id)) == expected_b
+
+
+def test_write_behind_keeps_the_order_of_each_session():
+    forks = conversation_store.get_stats()["forks"]
+    first, second = Conversation(uuid.uuid4().hex, window=3), Conversation(uuid.uuid4().hex, window=3)
+    for i in range(50):
+        first.append({"role": "user", "content": f"1-{i}"})
+        second.append({"role": "assistant", "content": f"2-{i}", "source": "faq"})
+    # Sem flush: as mensagens fora da janela são lidas do banco depois de a
+    # fila ser gravada.
+    assert contents(first) == [f"1-{i}" for i in range(50)]
+    assert second[0] == {"role": "assistant", "content": "2-0", "source": "faq"}
+
+    reloaded = Conversation.load(second.session_id, window=3)
+    assert len(reloaded) == 50
+    assert contents(reloaded) == [f"2-{i}" for i in range(50)]
+    assert [message["content"] for message in reloaded[-3:]] == ["2-47", "2-48", "2-49"]
+    assert conversation_store.get_stats()["forks"] == forks
+
+
+def test_messages_are_written_in_batches():
+    before = conversation_store.get_stats()
+    conversation = Conversation(uuid.uuid4().hex)
+    for i in range(20):
+        conversation.append({"role": "user", "content": str(i)})
+    conversation_store.flush()
+    after = conversation_store.get_stats()
+    assert after["written"] - before["written"] == 20
+    assert after["batches"] - before["batches"] < 20
+    assert after["pending"] == 0
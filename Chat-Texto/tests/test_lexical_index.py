@@ -0,0 +1,24 @@
+import pytest
+
+from lexical_index import LexicalIndex, stem, tokenize
+
+
+@pytest.mark.parametrize("singular, plural", [
+    ("controlador", "controladores"),
+    ("titular", "titulares"),
+    ("colaborador", "colaboradores"),
+    ("operador", "operadores"),
+    ("encarregado", "encarregados"),
+    ("informacao", "informacoes"),
+])
+def test_singular_and_plural_share_a_stem(singular, plural):
+    assert stem(singular) == stem(plural)
+
+
+def test_article_number_becomes_its_own_term():
+    assert "art18" in tokenize("Conforme o Art. 18 da LGPD")
+
+
+def test_generation_survives_save_and_load(tmp_path):
+    LexicalIndex.build(["Canal de Denúncias"], "abc").save(str(tmp_path))
+    assert LexicalIndex.load(str(tmp_path)).generation == "abc"
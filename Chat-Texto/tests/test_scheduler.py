@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+import scheduler
+from scheduler import Overloaded, Scheduler
+
+
+def new_scheduler(queue_max=100):
+    return Scheduler(max_concurrency=1, rate_per_min=6000, burst=100, queue_max=queue_max)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "tempo esgotado"
+        time.sleep(0.005)
+
+
+def test_queue_is_served_round_robin_between_sessions():
+    s = new_scheduler()
+    order = []
+
+    def ask(session_id, name):
+        with s.admit(session_id):
+            order.append(name)
+
+    threads = []
+    with s.admit("ocupa"):
+        # Enfileira uma de cada vez, para a ordem de chegada ser conhecida.
+        for session_id, name in (("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1")):
+            thread = threading.Thread(target=ask, args=(session_id, name))
+            thread.start()
+            threads.append(thread)
+            wait_until(lambda: s.get_stats()["queue_depth"] == len(threads))
+    for thread in threads:
+        thread.join(5)
+    # "b" chegou por último, mas não espera as três perguntas de "a".
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+def test_full_queue_rejects_with_overloaded():
+    s = new_scheduler(queue_max=1)
+
+    def ask():
+        with s.admit("a"):
+            pass
+
+    waiting = threading.Thread(target=ask)
+    with s.admit("ocupa"):
+        waiting.start()
+        wait_until(lambda: s.get_stats()["queue_depth"] == 1)
+        with pytest.raises(Overloaded):
+            with s.admit("b"):
+                pass
+        assert s.get_stats()["rejected"] == 1
+    waiting.join(5)
+
+
+def test_shared_admission_does_not_take_a_slot():
+    s = new_scheduler()
+    with s.admit("a"):
+        with s.admit("b", shared=True):
+            assert s.active == 1
+
+
+def test_quota_error_before_first_chunk_is_retried(monkeypatch):
+    monkeypatch.setattr(scheduler, "BACKOFF_INITIAL_S", 0.01)
+    s = new_scheduler()
+    attempts = []
+
+    def open_stream():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RuntimeError("429 quota exceeded")
+        return iter(["a", "b"])
+
+    assert list(s.with_backoff(open_stream)) == ["a", "b"]
+    assert len(attempts) == 3
+    assert s.get_stats()["backoffs"] == 2
+
+
+def test_other_errors_are_not_retried():
+    s = new_scheduler()
+    attempts = []
+
+    def open_stream():
+        attempts.append(1)
+        raise ValueError("prompt inválido")
+
+    with pytest.raises(ValueError):
+        list(s.with_backoff(open_stream))
+    assert len(attempts) == 1
@@ -0,0 +1,79 @@
+import threading
+import uuid
+
+import pytest
+
+import single_flight
+
+
+def gated_stream(pieces, gate, opened, closed=None):
+    # Stream do "modelo": libera um pedaço por vez, quando `gate` é sinalizado.
+    def open_stream():
+        opened.append(1)
+
+        def chunks():
+            try:
+                for piece in pieces:
+                    assert gate.acquire(timeout=5)
+                    yield piece
+            finally:
+                if closed is not None:
+                    closed.set()
+
+        return chunks()
+    return open_stream
+
+
+def test_follower_shares_the_leader_call_from_the_start():
+    key, gate, opened = uuid.uuid4().hex, threading.Semaphore(0), []
+    leader = single_flight.stream(key, gated_stream(["a", "b", "c"], gate, opened))
+    gate.release()
+    assert next(leader) == "a"
+
+    flight = single_flight.join(key)
+    assert flight is not None
+    gate.release()
+    gate.release()
+    # A seguidora chega depois do primeiro pedaço e mesmo assim o recebe.
+    assert list(single_flight.follow(flight)) == ["a", "b", "c"]
+    assert list(leader) == ["b", "c"]
+    assert len(opened) == 1
+
+
+def test_join_without_a_call_in_flight_returns_none():
+    assert single_flight.join(uuid.uuid4().hex) is None
+
+
+def test_call_is_cancelled_when_every_session_gives_up():
+    key, gate, opened, closed = uuid.uuid4().hex, threading.Semaphore(0), [], threading.Event()
+    leader = single_flight.stream(key, gated_stream(["a", "b", "c"], gate, opened, closed))
+    flight = single_flight.join(key)
+    gate.release()
+    assert next(leader) == "a"
+    leader.close()
+    # Ainda há uma seguidora: a chamada continua.
+    assert not flight.cancelled
+    single_flight.leave(flight)
+    assert flight.cancelled
+    assert isinstance(flight.error, single_flight.FlightCancelled)
+    gate.release()
+    assert closed.wait(5)
+    assert single_flight.join(key) is None
+
+
+def test_followers_get_timeout_error_when_the_model_stalls():
+    key, gate, opened = uuid.uuid4().hex, threading.Semaphore(0), []
+    leader = single_flight.stream(key, gated_stream(["a", "b"], gate, opened), timeout=0.05)
+    with pytest.raises(TimeoutError):
+        list(leader)
+    gate.release()
+    gate.release()
+
+
+def test_model_error_reaches_every_session():
+    def open_stream():
+        yield "a"
+        raise ConnectionError("caiu")
+
+    with pytest.raises(ConnectionError):
+        list(single_flight.stream(uuid.uuid4().hex, open_stream))
@@ -0,0 +1,61 @@
+from streaming import STREAM_CURSOR, fake_stream, iter_response_text, stream_to_placeholder
+
+TEXT = "A LGPD define o controlador como quem toma as decisões sobre o tratamento. " * 4
+
+
+class Placeholder:
+    def __init__(self):
+        self.renders = []
+
+    def markdown(self, text):
+        self.renders.append(text)
+
+
+def test_repaints_are_throttled():
+    placeholder = Placeholder()
+    result = stream_to_placeholder(fake_stream(TEXT, delay=0), placeholder, min_interval=60)
+    assert result.text == TEXT
+    assert result.error is None
+    assert result.chunks == len(range(0, len(TEXT), 8))
+    # Só o primeiro pedaço é pintado dentro do intervalo.
+    assert result.renders == len(placeholder.renders) == 1
+    assert placeholder.renders[0] == TEXT[:8] + STREAM_CURSOR
+
+
+def test_every_chunk_is_painted_without_a_minimum_interval():
+    placeholder = Placeholder()
+    result = stream_to_placeholder(fake_stream(TEXT, delay=0), placeholder, min_interval=0)
+    assert result.renders == result.chunks
+    assert placeholder.renders[-1] == TEXT + STREAM_CURSOR
+
+
+def test_partial_text_survives_an_error_mid_stream():
+    placeholder = Placeholder()
+    result = stream_to_placeholder(fake_stream(TEXT, delay=0, fail_after=3), placeholder, min_interval=0)
+    assert isinstance(result.error, ConnectionError)
+    assert result.text == TEXT[:24]
+    assert result.chunks == 3
+    assert result.time_to_first_chunk is not None
+
+
+def test_error_before_the_first_chunk_leaves_no_text():
+    result = stream_to_placeholder(fake_stream(TEXT, delay=0, fail_after=0), Placeholder())
+    assert isinstance(result.error, ConnectionError)
+    assert result.text == ""
+    assert result.time_to_first_chunk is None
+
+
+class Chunk:
+    def __init__(self, text):
+        self._text = text
+
+    @property
+    def text(self):
+        if self._text is None:
+            raise ValueError("pedaço bloqueado")
+        return self._text
+
+
+def test_response_text_skips_blocked_and_empty_chunks():
+    response = [Chunk("Olá"), Chunk(None), Chunk(""), Chunk(", mundo")]
+    assert list(iter_response_text(response)) == ["Olá", ", mundo"]
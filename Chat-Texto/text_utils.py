@@ -0,0 +1,46 @@
+import re
+import unicodedata
+
+# --- NORMALIZAÇÃO DE TEXTO ---
+# Funções compartilhadas para comparar textos em português ignorando
+# maiúsculas, acentos e pontuação.
+
+# Palavras muito frequentes em português (já sem acentos), ignoradas em buscas.
+STOPWORDS = frozenset("""
+a ao aos as ate com como da das de dela dele deles do dos e ela elas ele eles em entre era essa esse esta
+este eu foi for ha isso isto ja la lhe mais mas me mesmo meu minha muito na nas nao nem no nos nossa nosso
+num numa o os ou para pela pelas pelo pelos por qual quais quando que quem se sem ser seu seus sua suas
+sao so tambem te tem todo toda todos todas tu um uma umas uns voce voces vos
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_SPACES_RE = re.compile(r"\s+")
+
+
+def fold_accents(text):
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c))
+
+
+def normalize_text(text):
+    # "Qual é o Código de Ética?" -> "qual e o codigo de etica"
+    folded = fold_accents(text.lower())
+    return " ".join(_WORD_RE.findall(folded))
+
+
+def words(text):
+    return _WORD_RE.findall(fold_accents(text.lower()))
+
+
+def content_words(text):
+    return [w for w in words(text) if w not in STOPWORDS]
+
+
+def collapse_spaces(text):
+    return _SPACES_RE.sub(" ", text).strip()
+
+
+def estimate_tokens(text):
+    # Aproximação barata (~4 caracteres por token), suficiente para orçamento
+    # de contexto sem depender do tokenizador do modelo.
+    return len(text) // 4 + 1
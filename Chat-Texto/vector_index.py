@@ -0,0 +1,109 @@
+import json
+import os
+
+import numpy as np
+
+# --- ÍNDICE VETORIAL EM DISCO ---
+# Layout do diretório do índice:
+#   meta.json     -> versão, embedder, dimensão, quantidade de trechos, o
+#                    hash de cada PDF indexado (usado pelo ingest.py) e a
+#                    geração, um id gravado também no índice lexical
+#   chunks.jsonl  -> um trecho (id, source, page, text) por linha
+#   vectors.npy   -> matriz float32 (n_trechos x dim), vetores normalizados
+# A busca é por similaridade de cosseno (produto interno de vetores normalizados).
+# Os vetores são abertos com memory-map: carregar o índice não copia a matriz
+# para a memória, e processos diferentes compartilham as mesmas páginas.
+#
+# Gravar troca os três arquivos um por vez (trechos, vetores e, por último,
+# meta.json), então quem lê no meio da troca pode pegar arquivos de versões
+# diferentes. A leitura vai na ordem inversa (meta, vetores, trechos) e
+# confere quantidade de trechos, linhas da matriz e tamanho do chunks.jsonl
+# contra o meta.json; se não baterem, levanta IndexNotReady e quem chamou
+# tenta de novo depois.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+INDEX_DIR = os.environ.get("EMI_INDEX_DIR", os.path.join(BASE_DIR, "index"))
+INDEX_VERSION = 2
+
+META_FILE = "meta.json"
+CHUNKS_FILE = "chunks.jsonl"
+VECTORS_FILE = "vectors.npy"
+
+
+class IndexNotReady(Exception):
+    pass
+
+
+class VectorIndex:
+    def __init__(self, chunks, vectors, embedder_name, files=None, generation=None):
+        self.chunks = chunks
+        self.vectors = vectors
+        self.embedder_name = embedder_name
+        self.files = files or {}
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def scores(self, query_vector):
+        if not len(self.chunks):
+            return np.zeros(0, dtype=np.float32)
+        return self.vectors @ np.asarray(query_vector, dtype=np.float32)
+
+    def search(self, query_vector, k=4):
+        if not len(self.chunks):
+            return []
+        scores = self.scores(query_vector)
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self.chunks[i], float(scores[i])) for i in top]
+
+    def save(self, index_dir=INDEX_DIR):
+        os.makedirs(index_dir, exist_ok=True)
+        # Grava em arquivos temporários e troca no final, para que um app
+        # lendo o índice nunca veja um estado pela metade.
+        with open(os.path.join(index_dir, CHUNKS_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            for chunk in self.chunks:
+                f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+        with open(os.path.join(index_dir, VECTORS_FILE + ".tmp"), "wb") as f:
+            np.save(f, np.asarray(self.vectors, dtype=np.float32))
+        meta = {
+            "version": INDEX_VERSION,
+            "embedder": self.embedder_name,
+            "dim": int(self.vectors.shape[1]) if len(self.chunks) else 0,
+            "count": len(self.chunks),
+            "files": self.files,
+            "generation": self.generation,
+        }
+        meta["chunks_bytes"] = os.path.getsize(os.path.join(index_dir, CHUNKS_FILE + ".tmp"))
+        with open(os.path.join(index_dir, META_FILE + ".tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2, ensure_ascii=False)
+        for name in (CHUNKS_FILE, VECTORS_FILE, META_FILE):
+            os.replace(os.path.join(index_dir, name + ".tmp"), os.path.join(index_dir, name))
+
+    @classmethod
+    def load(cls, index_dir=INDEX_DIR):
+        with open(os.path.join(index_dir, META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"Índice em '{index_dir}' tem versão incompatível; reconstrua com ingest.py --full.")
+        vectors = np.load(os.path.join(index_dir, VECTORS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, CHUNKS_FILE), encoding="utf-8") as f:
+            chunks_bytes = os.fstat(f.fileno()).st_size
+            try:
+                chunks = [json.loads(line) for line in f if line.strip()]
+            except ValueError as e:
+                raise IndexNotReady(f"chunks.jsonl ilegível ({e}); o índice está sendo regravado?") from None
+        count = meta.get("count")
+        expected_bytes = meta.get("chunks_bytes", chunks_bytes)
+        if count != len(chunks) or vectors.shape[0] != count or expected_bytes != chunks_bytes:
+            raise IndexNotReady(
+                f"arquivos do índice em '{index_dir}' são de versões diferentes "
+                f"(meta: {count} trechos, chunks.jsonl: {len(chunks)}, vectors.npy: {vectors.shape[0]})."
+            )
+        return cls(chunks, vectors, meta["embedder"], meta.get("files"), meta.get("generation"))
+
+
+def exists(index_dir=INDEX_DIR):
+    return os.path.exists(os.path.join(index_dir, META_FILE))